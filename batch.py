@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+from browser_pool import run_sync  # noqa: E402
+from intervals import common_availability, format_availability, positive_int  # noqa: E402
+from scraper import (  # noqa: E402
+    MAX_CONCURRENT_SCRAPES, _months, _next_month, availability_from_months, parse_calendly_url,
+    prefetch_month_async
+)
+
+# Batch mode: read {links, start_date, end_date} jobs from JSONL, scrape every distinct
+# (event path, month) once, and write one JSONL result per job as soon as it is ready.
+#
+#   python batch.py jobs.jsonl -o results.jsonl
+#   python batch.py jobs.jsonl -o results.jsonl --resume   # skip jobs already done in results.jsonl
+
+
+def read_jobs(path):
+    jobs = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as e:
+                jobs.append({'id': str(line_number), 'error': f"Invalid JSON: {str(e)}"})
+                continue
+            job = {'id': str(data.get('id', line_number))}
+            try:
+                job['links'] = data.get('calendly_links') or data.get('links') or []
+                job['start_date'] = datetime.strptime(data['start_date'], '%Y-%m-%d')
+                job['end_date'] = datetime.strptime(data['end_date'], '%Y-%m-%d')
+                job['options'] = {name: positive_int(data, name) for name in ('quorum', 'min_minutes', 'limit')}
+                if not job['links']:
+                    job['error'] = "No Calendly links provided"
+            except (KeyError, TypeError, ValueError) as e:
+                job['error'] = f"Invalid job: {str(e)}"
+            jobs.append(job)
+    return jobs
+
+
+def _succeeded(result):
+    # A job counts as done only if neither it nor any of its calendars failed;
+    # a transient scrape error should get another try on resume
+    if not isinstance(result, dict) or 'id' not in result or result.get('error'):
+        return False
+    return not any(isinstance(cal, dict) and cal.get('error') for cal in result.get('calendars') or [])
+
+
+def read_checkpoint(path):
+    # Ids of jobs whose results are already in the output file. Lines for failed jobs,
+    # and a line cut short by the interruption, are dropped from the file so those jobs
+    # run again and their new results take their place instead of sitting next to them.
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+    kept = []
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if _succeeded(result):
+                done.add(str(result['id']))
+                kept.append(line if line.endswith('\n') else line + '\n')
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.writelines(kept)
+    os.replace(temp_path, path)
+    return done
+
+
+def plan_months(jobs):
+    # Every distinct (event path, month) across all jobs, with the union of the date ranges
+    # asked for in that month, in the order jobs first need them
+    months = {}
+    for job in jobs:
+        for link in job['links']:
+            event_path = parse_calendly_url(link)
+            if not event_path:
+                continue
+            for month_start in _months(job['start_date'], job['end_date']):
+                month_end = _next_month(month_start) - timedelta(days=1)
+                first = max(job['start_date'], month_start)
+                last = min(job['end_date'], month_end)
+                key = (event_path, month_start)
+                if key in months:
+                    months[key] = (min(months[key][0], first), max(months[key][1], last))
+                else:
+                    months[key] = (first, last)
+    return months
+
+
+async def run_batch(jobs, out, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    months = plan_months([job for job in jobs if not job.get('error')])
+    print(f"{len(jobs)} jobs need {len(months)} distinct calendar months")
+
+    async def fetch(event_path, month_start, first, last):
+        # The month record itself is kept for the whole run, so jobs never depend on it
+        # still being in the cache; a failure is kept too and reported by every job needing it
+        async with semaphore:
+            try:
+                return await prefetch_month_async(event_path, month_start, first, last)
+            except Exception as e:
+                print(f"Failed to prefetch {event_path} {month_start.strftime('%Y-%m')}: {str(e)}")
+                return e
+
+    # Scheduled in job order so the first jobs complete (and stream out) first
+    tasks = {
+        key: asyncio.ensure_future(fetch(key[0], key[1], first, last))
+        for key, (first, last) in months.items()
+    }
+
+    written = 0
+
+    def write(result):
+        nonlocal written
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+        written += 1
+
+    async def calendar(link, start_date, end_date):
+        entry = {'calendly_link': link, 'available_times': [], 'duration': None}
+        event_path = parse_calendly_url(link)
+        if not event_path:
+            entry['error'] = "Invalid Calendly link"
+            return entry
+        months = []
+        for month_start in _months(start_date, end_date):
+            month = await tasks[(event_path, month_start)]
+            if isinstance(month, Exception):
+                entry['error'] = f"Failed to get availability: {str(month)}"
+                return entry
+            months.append((month_start, month))
+        entry.update(availability_from_months(months, start_date, end_date))
+        return entry
+
+    async def run_job(job):
+        if job.get('error'):
+            write({'id': job['id'], 'error': job['error']})
+            return
+        try:
+            calendars = [await calendar(link, job['start_date'], job['end_date']) for link in job['links']]
+            common = common_availability(calendars, **job['options'])
+            write(format_availability({'id': job['id'], **common, 'calendars': calendars}))
+        except Exception as e:
+            # One broken job gets an error line instead of ending the run
+            print(f"Error in job {job['id']}: {str(e)}")
+            write({'id': job['id'], 'error': f"Failed to run job: {str(e)}"})
+
+    started = time.time()
+    await asyncio.gather(*[run_job(job) for job in jobs])
+    print(f"Wrote {written} results in {time.time() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check availability for a JSONL file of jobs")
+    parser.add_argument('jobs', help="JSONL file, one {\"links\", \"start_date\", \"end_date\"} job per line")
+    parser.add_argument('-o', '--output', help="JSONL results file (default: stdout)")
+    parser.add_argument('--resume', action='store_true', help="skip jobs already done in the output file, retry failed ones and append")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_SCRAPES,
+                        help="calendar months scraped at once")
+    args = parser.parse_args()
+
+    if args.resume and not args.output:
+        parser.error("--resume needs --output")
+
+    jobs = read_jobs(args.jobs)
+    done = read_checkpoint(args.output) if args.resume else set()
+    pending = [job for job in jobs if job['id'] not in done]
+    if done:
+        print(f"Resuming: {len(jobs) - len(pending)} of {len(jobs)} jobs already done")
+
+    if args.output:
+        out = open(args.output, 'a' if args.resume else 'w')
+    else:
+        out = sys.stdout
+    try:
+        # Results own stdout; the scraper's progress output goes to stderr
+        with redirect_stdout(sys.stderr):
+            run_sync(run_batch(pending, out, max(1, args.concurrency)))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intervals import (  # noqa: E402
+    format_utc, intersect, intersect_all, meeting_starts, quorum_windows, to_intervals, with_min_length
+)
+
+DAY = 86400
+SLOT = 30 * 60
+TARGET_MS = 1.0
+
+
+def make_calendar(rng, days, base):
+    # Business-hours availability with a few random bookings punched out of each day
+    starts = []
+    for day in range(days):
+        if rng.random() < 0.25:
+            continue
+        day_start = base + day * DAY + 16 * 3600
+        for slot in range(16):
+            if rng.random() > 0.2:
+                starts.append(day_start + slot * SLOT)
+    return starts
+
+
+def make_busy_calendar(rng, days, base):
+    # Business hours every day with one booking each, so every calendar stays free for
+    # most of every day and the exact-all intersection never runs empty
+    starts = []
+    for day in range(days):
+        day_start = base + day * DAY + 16 * 3600
+        booked = rng.randrange(16)
+        starts.extend(day_start + slot * SLOT for slot in range(16) if slot != booked)
+    return starts
+
+
+def check_engine():
+    # Small cases with known answers, so a fast but wrong engine fails here before it is timed
+    assert to_intervals([0, 30, 60, 120], 30) == [(0, 90), (120, 150)]
+    assert intersect([(0, 10), (20, 30)], [(5, 25)]) == [(5, 10), (20, 25)]
+    assert intersect([(0, 10)], [(10, 20)]) == []
+    assert intersect([(0, 10)], []) == []
+    assert intersect_all([[(0, 100)], [(10, 50), (60, 90)], [(20, 70)]]) == [(20, 50), (60, 70)]
+    assert intersect_all([[(0, 10)], [(10, 20)], [(0, 20)]]) == []
+
+    calendars = [[(0, 10)], [(10, 20)], [(5, 15)]]
+    # Touching intervals never overlap, so two calendars are only free together where they share time
+    assert quorum_windows(calendars, 2) == [(5, 15, 2)]
+    assert quorum_windows(calendars, 1) == [(0, 20, 2)]
+    assert quorum_windows(calendars, 3) == []
+    assert quorum_windows(calendars, 4) == []
+    assert quorum_windows(calendars, 0) == []
+    assert quorum_windows([[(0, 10)], [(0, 10)]], 2) == [(0, 10, 2)]
+
+    windows = [(0, 30, 2), (60, 120, 3)]
+    assert with_min_length(windows, 30) == windows
+    assert with_min_length(windows, 31) == [(60, 120, 3)]
+    assert with_min_length(windows, 61) == []
+    candidates = [0, 10, 30, 60, 80, 90, 100]
+    assert meeting_starts(windows, candidates, 30) == [0, 60, 80, 90]
+    assert meeting_starts(windows, candidates, 30, 2) == [0, 60]
+    assert meeting_starts(windows, candidates, 61) == []
+    assert meeting_starts([], candidates, 30) == []
+
+
+def best_ms(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the common-availability engine")
+    parser.add_argument('--calendars', type=int, default=36)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    check_engine()
+    print("engine checks passed")
+    rng = random.Random(args.seed)
+    base = 1704067200  # 2024-01-01T00:00:00Z
+    for name, make in (('sparse', make_calendar), ('busy', make_busy_calendar)):
+        print()
+        run_scenario(name, [make(rng, args.days, base) for _ in range(args.calendars)], args)
+
+
+def run_scenario(name, slot_starts, args):
+    calendars = [to_intervals(starts, SLOT) for starts in slot_starts]
+    candidates = sorted(set().union(*slot_starts))
+    total_slots = sum(len(starts) for starts in slot_starts)
+    quorum = max(1, args.calendars * 2 // 3)
+
+    print(f"{name}: {args.calendars} calendars, {args.days} days, {total_slots} slots, "
+          f"{sum(len(c) for c in calendars)} merged intervals")
+
+    exact = intersect_all(calendars)
+    windows = quorum_windows(calendars, quorum)
+    # The exact-all result is the quorum of every calendar, so the two paths must agree
+    assert [(start, end) for start, end, _ in quorum_windows(calendars, args.calendars)] == exact
+    results = [
+        ('to_intervals (all calendars)', best_ms(lambda: [to_intervals(s, SLOT) for s in slot_starts], 10)),
+        ('exact-all intersection', best_ms(lambda: intersect_all(calendars), 200)),
+        (f'{quorum}-of-{args.calendars} quorum sweep', best_ms(lambda: quorum_windows(calendars, quorum), 20)),
+        ('60-minute minimum length', best_ms(lambda: with_min_length(windows, 3600), 200)),
+        ('earliest 5 meeting starts', best_ms(lambda: meeting_starts(windows, candidates, 3600, 5), 200)),
+    ]
+    for stage, ms in results:
+        verdict = 'under' if ms < TARGET_MS else 'OVER'
+        print(f"{stage:40s} {ms:9.4f} ms  ({verdict} the {TARGET_MS:g} ms target)")
+    print(f"exact-all windows: {len(exact)}, quorum windows: {len(windows)}"
+          + (f", first quorum window at {format_utc(windows[0][0])}" if windows else ""))
+
+
+if __name__ == '__main__':
+    main()
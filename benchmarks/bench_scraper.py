@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fake_calendly import FakeCalendlyConfig, start_server  # noqa: E402
+
+START_DATE = datetime(2030, 1, 1)
+SCENARIOS = [
+    (links, months, cache)
+    for links in (1, 10)
+    for months in (1, 6)
+    for cache in ('cold', 'warm')
+]
+
+
+def scenario_name(links, months, cache):
+    return f"{links}-links/{months}-months/{cache}"
+
+
+def month_range(months):
+    end = START_DATE
+    for _ in range(months):
+        end = (end.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return START_DATE, end - timedelta(days=1)
+
+
+def counter_total(snapshot, name):
+    return sum(value for (counter, _), value in snapshot['counters'].items() if counter == name)
+
+
+def phase_totals(before, after):
+    phases = {}
+    for key, histogram in after['histograms'].items():
+        name, labels = key
+        if name != 'scrape_phase_seconds':
+            continue
+        previous = before['histograms'].get(key, {'sum': 0.0, 'count': 0})
+        count = histogram['count'] - previous['count']
+        if not count:
+            continue
+        phase = dict(labels)['phase']
+        total = phases.setdefault(phase, {'count': 0, 'seconds': 0.0})
+        total['count'] += count
+        total['seconds'] += histogram['sum'] - previous['sum']
+    return {phase: dict(total, seconds=round(total['seconds'], 4)) for phase, total in sorted(phases.items())}
+
+
+class MemorySampler:
+    # Polls the browser pool's resident memory while a scenario runs and keeps the peak
+    def __init__(self, run_sync, pool, interval=0.25):
+        self.run_sync = run_sync
+        self.pool = pool
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.peak_mb = max(self.peak_mb, self.run_sync(self.pool.memory_mb(), 5))
+            except Exception as e:
+                print(f"Failed to sample browser memory: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_scenario(server, links, months, cache):
+    from browser_pool import get_pool, run_sync
+    from cache import availability_cache
+    from metrics import metrics
+    from scraper import plan_links_async
+
+    urls = [f"{server.base_url}/bench/event-{i}" for i in range(links)]
+    start_date, end_date = month_range(months)
+    availability_cache.clear()
+    if cache == 'warm':
+        run_sync(plan_links_async(urls, start_date, end_date))
+
+    before = metrics.snapshot()
+    requests_before = dict(server.requests)
+    with MemorySampler(run_sync, get_pool()) as sampler:
+        started = time.perf_counter()
+        calendars = run_sync(plan_links_async(urls, start_date, end_date))
+        wall = time.perf_counter() - started
+    after = metrics.snapshot()
+
+    pages = counter_total(after, 'calendly_pages_loaded_total') - counter_total(before, 'calendly_pages_loaded_total')
+    return {
+        'wall_seconds': round(wall, 4),
+        'pages_loaded': pages,
+        'pages_per_second': round(pages / wall, 2) if wall else 0.0,
+        'api_requests': server.requests['api'] - requests_before['api'],
+        'days_clicked': (counter_total(after, 'calendly_days_clicked_total')
+                         - counter_total(before, 'calendly_days_clicked_total')),
+        'requests_blocked': (counter_total(after, 'requests_blocked_total')
+                             - counter_total(before, 'requests_blocked_total')),
+        'slots_found': sum(len(entry.get('available_times', [])) for entry in calendars),
+        'errors': [entry['error'] for entry in calendars if entry.get('error')],
+        'peak_browser_mb': round(sampler.peak_mb, 1),
+        'phases': phase_totals(before, after),
+    }
+
+
+def check_regressions(results, baseline, tolerance):
+    failures = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        limit = expected['wall_seconds'] * (1 + tolerance)
+        if result['wall_seconds'] > limit:
+            failures.append(f"{name}: {result['wall_seconds']:.2f}s vs baseline "
+                            f"{expected['wall_seconds']:.2f}s (limit {limit:.2f}s)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper end to end against a local fake Calendly")
+    parser.add_argument('--mode', choices=('xhr', 'dom'), default='xhr', help="CALENDLY_EXTRACTION_MODE to run with")
+    parser.add_argument('--only', help="run only scenarios whose name contains this")
+    parser.add_argument('--page-latency-ms', type=int, default=150)
+    parser.add_argument('--api-latency-ms', type=int, default=100)
+    parser.add_argument('--click-latency-ms', type=int, default=80)
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="fail if any scenario is slower than this results file allows")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown over the baseline (0.25 = 25%%)")
+    parser.add_argument('--save-baseline', help="write the results as a new baseline")
+    args = parser.parse_args()
+
+    server = start_server(FakeCalendlyConfig(
+        page_latency_ms=args.page_latency_ms,
+        api_latency_ms=args.api_latency_ms,
+        click_latency_ms=args.click_latency_ms,
+        xhr=args.mode == 'xhr',
+    ))
+    # Settings are read at import time, so point the scraper at the fake server first
+    state_dir = tempfile.mkdtemp(prefix='bench-scraper-')
+    os.environ['CALENDLY_BASE_URL'] = server.base_url
+    os.environ['CALENDLY_EXTRACTION_MODE'] = args.mode
+    # Measure the scraper, not the politeness limits meant for the real calendly.com
+    os.environ['GOVERNOR_RATE_PER_SECOND'] = '0'
+    os.environ['GOVERNOR_MAX_CONCURRENCY'] = '64'
+    os.environ['AVAILABILITY_DB_PATH'] = ''
+    os.environ['STORAGE_STATE_PATH'] = os.path.join(state_dir, 'browser_state.json')
+
+    from browser_pool import get_pool, run_sync, shutdown
+
+    print(f"Fake Calendly at {server.base_url}, extraction mode {args.mode}")
+    results = {}
+    try:
+        started = time.perf_counter()
+        run_sync(get_pool().start())
+        print(f"Browser pool started in {time.perf_counter() - started:.2f}s")
+
+        for links, months, cache in SCENARIOS:
+            name = scenario_name(links, months, cache)
+            if args.only and args.only not in name:
+                continue
+            result = run_scenario(server, links, months, cache)
+            results[name] = result
+            print(f"{name:28s} {result['wall_seconds']:8.2f}s {result['pages_loaded']:4d} pages "
+                  f"{result['pages_per_second']:6.2f} pages/s {result['days_clicked']:4d} days clicked "
+                  f"{result['peak_browser_mb']:7.1f} MB peak {len(result['errors'])} errors")
+            phases = ', '.join(f"{phase} {t['seconds']:.2f}s/{t['count']}" for phase, t in result['phases'].items())
+            print(f"{'':28s} {phases}")
+    finally:
+        shutdown()
+        server.shutdown()
+
+    print(f"Python peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = check_regressions(results, json.load(f), args.tolerance)
+        if failures:
+            print("Regressions against the baseline:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
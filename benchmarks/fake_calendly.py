@@ -0,0 +1,274 @@
+import argparse
+import json
+import random
+import threading
+import time
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+
+# A stand-in for Calendly booking pages: the same DOM the scraper reads (day buttons,
+# time buttons, clock icon, OneTrust banner) and the same availability API responses,
+# with availability derived deterministically from the event path and date.
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Fake Calendly - __EVENT_PATH__</title></head>
+<body>
+<div id="root">
+  <div class="event-details">
+    <div><svg width="10" height="10" viewBox="0 0 10 10"><path d="M.5 5a4.5 4.5 0 1 0 9 0 4.5 4.5 0 1 0-9 0"></path></svg></div>
+    <span>__DURATION__ min</span>
+  </div>
+  <div id="calendar"></div>
+  <div id="times"></div>
+</div>
+<div id="onetrust-banner-sdk" style="display: none">
+  <p>This website uses cookies to enhance your experience.</p>
+  <button id="onetrust-accept-btn-handler">Accept All Cookies</button>
+</div>
+<script>
+const config = __CONFIG__;
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+const weekdays = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'];
+const monthNames = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+    'August', 'September', 'October', 'November', 'December'];
+
+// '2024-01-02T09:30:00-08:00' -> '9:30am', read straight from the local wall time
+function displayTime(startTime) {
+    const hours = parseInt(startTime.slice(11, 13));
+    const minutes = startTime.slice(14, 16);
+    return `${hours % 12 || 12}:${minutes}${hours < 12 ? 'am' : 'pm'}`;
+}
+
+if (config.consent && !document.cookie.includes('OptanonAlertBoxClosed')) {
+    const banner = document.getElementById('onetrust-banner-sdk');
+    banner.style.display = 'block';
+    document.getElementById('onetrust-accept-btn-handler').addEventListener('click', () => {
+        document.cookie = 'OptanonAlertBoxClosed=' + new Date().toISOString() + '; path=/; max-age=31536000';
+        setTimeout(() => { banner.style.display = 'none'; }, 50);
+    });
+}
+
+async function loadDays() {
+    if (!config.xhr) {
+        await sleep(config.apiLatencyMs);
+        return config.days;
+    }
+    const base = `/api/booking/event_types/${config.eventPath}`;
+    const [, range] = await Promise.all([
+        fetch(base).then(r => r.json()),
+        fetch(`${base}/calendar/range?timezone=${encodeURIComponent(config.timezone)}` +
+            `&range_start=${config.month}-01&range_end=${config.month}-${config.daysInMonth}`).then(r => r.json())
+    ]);
+    const days = {};
+    for (const day of range.days) {
+        if (day.status === 'available') {
+            days[day.date] = day.spots.map(spot => displayTime(spot.start_time));
+        }
+    }
+    return days;
+}
+
+function showTimes(times) {
+    const list = document.getElementById('times');
+    list.innerHTML = '';
+    for (const time of times) {
+        const button = document.createElement('button');
+        button.textContent = time;
+        list.appendChild(button);
+    }
+}
+
+loadDays().then(days => {
+    const calendar = document.getElementById('calendar');
+    for (let day = 1; day <= config.daysInMonth; day++) {
+        const dateStr = `${config.month}-${String(day).padStart(2, '0')}`;
+        const when = new Date(`${dateStr}T12:00:00Z`);
+        const label = `${weekdays[when.getUTCDay()]}, ${monthNames[when.getUTCMonth()]} ${day}`;
+        const button = document.createElement('button');
+        button.textContent = String(day);
+        if (days[dateStr]) {
+            button.setAttribute('aria-label', `${label} - Times available`);
+            button.addEventListener('click', () => setTimeout(() => showTimes(days[dateStr]), config.clickLatencyMs));
+        } else {
+            button.setAttribute('aria-label', `${label} - No times available`);
+            button.disabled = true;
+        }
+        calendar.appendChild(button);
+    }
+});
+</script>
+</body>
+</html>
+"""
+
+
+class FakeCalendlyConfig:
+    def __init__(self, page_latency_ms=150, api_latency_ms=100, click_latency_ms=80, xhr=True, consent=True,
+                 availability=0.6, duration_minutes=30, timezone='America/Los_Angeles'):
+        self.page_latency_ms = page_latency_ms
+        self.api_latency_ms = api_latency_ms
+        self.click_latency_ms = click_latency_ms
+        self.xhr = xhr
+        self.consent = consent
+        self.availability = availability
+        self.duration_minutes = duration_minutes
+        self.timezone = timezone
+
+
+def day_slots(event_path, day, config):
+    # Local start times for one day: weekdays only, 9am-5pm, some slots already booked
+    rng = random.Random(f"{event_path}:{day.isoformat()}")
+    if day.weekday() >= 5 or rng.random() > config.availability:
+        return []
+    tz = ZoneInfo(config.timezone)
+    start = datetime(day.year, day.month, day.day, 9, tzinfo=tz)
+    step = timedelta(minutes=config.duration_minutes)
+    slots = []
+    moment = start
+    while moment < start.replace(hour=17):
+        if rng.random() < 0.75:
+            slots.append(moment)
+        moment += step
+    return slots
+
+
+def month_days(event_path, month, config):
+    year, month_number = (int(part) for part in month.split('-'))
+    return {
+        date(year, month_number, day).isoformat(): day_slots(event_path, date(year, month_number, day), config)
+        for day in range(1, monthrange(year, month_number)[1] + 1)
+    }
+
+
+def _display_time(moment):
+    return f"{moment.hour % 12 or 12}:{moment.minute:02d}{'am' if moment.hour < 12 else 'pm'}"
+
+
+class FakeCalendlyHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        config = self.server.config
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path.strip('/')
+        if path == 'favicon.ico':
+            return self._send(404, '', 'text/plain')
+
+        if path.startswith('api/booking/event_types/'):
+            self.server.record('api')
+            time.sleep(config.api_latency_ms / 1000)
+            event_path = path[len('api/booking/event_types/'):]
+            if event_path.endswith('/calendar/range'):
+                event_path = event_path[:-len('/calendar/range')]
+                month = query.get('range_start', [date.today().isoformat()])[0][:7]
+                days = [
+                    {
+                        'date': date_str,
+                        'status': 'available' if slots else 'unavailable',
+                        'spots': [{'status': 'available', 'start_time': slot.isoformat()} for slot in slots],
+                    }
+                    for date_str, slots in month_days(event_path, month, config).items()
+                ]
+                body = {'availability_timezone': config.timezone, 'days': days}
+            else:
+                body = {'duration': config.duration_minutes, 'slug': event_path}
+            return self._send(200, json.dumps(body), 'application/json')
+
+        if not path or path.count('/') > 2:
+            return self._send(404, 'Not found', 'text/plain')
+
+        self.server.record('page')
+        time.sleep(config.page_latency_ms / 1000)
+        month = query.get('month', [date.today().strftime('%Y-%m')])[0]
+        days = month_days(path, month, config)
+        page_config = {
+            'eventPath': path,
+            'month': month,
+            'daysInMonth': len(days),
+            'timezone': config.timezone,
+            'xhr': config.xhr,
+            'consent': config.consent,
+            'apiLatencyMs': config.api_latency_ms,
+            'clickLatencyMs': config.click_latency_ms,
+            # Without XHR the page renders from data embedded in the document
+            'days': {} if config.xhr else {
+                date_str: [_display_time(slot) for slot in slots] for date_str, slots in days.items() if slots
+            },
+        }
+        html = (PAGE_TEMPLATE
+                .replace('__CONFIG__', json.dumps(page_config).replace('</', '<\\/'))
+                .replace('__EVENT_PATH__', path)
+                .replace('__DURATION__', str(config.duration_minutes)))
+        self._send(200, html, 'text/html; charset=utf-8')
+
+
+class FakeCalendlyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, FakeCalendlyHandler)
+        self.config = config
+        self.requests = {'page': 0, 'api': 0}
+        self._lock = threading.Lock()
+
+    def record(self, kind):
+        with self._lock:
+            self.requests[kind] += 1
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(config=None, host='127.0.0.1', port=0):
+    # Serve in a background thread; port 0 picks a free port (see server.base_url)
+    server = FakeCalendlyServer((host, port), config or FakeCalendlyConfig())
+    threading.Thread(target=server.serve_forever, name='fake-calendly', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake Calendly booking pages for offline testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--page-latency-ms', type=int, default=150)
+    parser.add_argument('--api-latency-ms', type=int, default=100)
+    parser.add_argument('--click-latency-ms', type=int, default=80)
+    parser.add_argument('--no-xhr', action='store_true', help="embed availability in the page instead of fetching it")
+    parser.add_argument('--no-consent', action='store_true', help="don't show the cookie banner")
+    parser.add_argument('--availability', type=float, default=0.6, help="share of weekdays with open slots")
+    args = parser.parse_args()
+
+    config = FakeCalendlyConfig(
+        page_latency_ms=args.page_latency_ms,
+        api_latency_ms=args.api_latency_ms,
+        click_latency_ms=args.click_latency_ms,
+        xhr=not args.no_xhr,
+        consent=not args.no_consent,
+        availability=args.availability,
+    )
+    server = FakeCalendlyServer((args.host, args.port), config)
+    print(f"Fake Calendly serving at {server.base_url} (set CALENDLY_BASE_URL to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+import asyncio
+import atexit
+import os
+import threading
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from resource_policy import install_request_policy
+from storage_state import storage_state
+from metrics import span
+
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '2'))
+BROWSER_MAX_USES = int(os.getenv('BROWSER_MAX_USES', '100'))
+BROWSER_MAX_MEMORY_MB = int(os.getenv('BROWSER_MAX_MEMORY_MB', '1024'))
+# Reading the process tree over CDP is cheap but not free, so only do it every few releases
+BROWSER_MEMORY_CHECK_EVERY = int(os.getenv('BROWSER_MEMORY_CHECK_EVERY', '10'))
+
+VIEWPORT = {'width': 1280, 'height': 800}
+
+
+class PooledBrowser:
+    def __init__(self, browser):
+        self.browser = browser
+        self.uses = 0
+        self.active = 0
+        self.retiring = False
+
+    @property
+    def healthy(self):
+        return not self.retiring and self.browser.is_connected()
+
+
+class BrowserPool:
+    def __init__(self, size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES, max_memory_mb=BROWSER_MAX_MEMORY_MB):
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self._playwright = None
+        self._browsers = []
+        self._lock = None
+        self._closed = False
+
+    async def start(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            if self._playwright is not None:
+                return
+            print(f"Starting browser pool with {self.size} browser(s)")
+            self._playwright = await async_playwright().start()
+            self._browsers = list(await asyncio.gather(*[self._launch() for _ in range(self.size)]))
+
+    async def _launch(self):
+        with span('browser_launch'):
+            browser = await self._playwright.chromium.launch(headless=True)
+        return PooledBrowser(browser)
+
+    async def _pick(self):
+        # Replace browsers that crashed or were retired before handing one out
+        async with self._lock:
+            for i, pooled in enumerate(self._browsers):
+                if not pooled.healthy:
+                    pooled.retiring = True
+                    self._browsers[i] = await self._launch()
+                    if pooled.active == 0:
+                        await self._close_browser(pooled)
+            return min(self._browsers, key=lambda b: b.active)
+
+    @asynccontextmanager
+    async def page(self, **context_options):
+        # Hand out a fresh, isolated context on a warm browser
+        await self.start()
+        pooled = await self._pick()
+        pooled.active += 1
+        context = None
+        try:
+            options = {'viewport': VIEWPORT}
+            # Start from the saved cookies so the consent banner was already accepted
+            saved_state = storage_state.load()
+            if saved_state is not None:
+                options['storage_state'] = saved_state
+            options.update(context_options)
+            with span('new_context'):
+                context = await pooled.browser.new_context(**options)
+                await install_request_policy(context)
+                page = await context.new_page()
+            yield page
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    print(f"Failed to close browser context: {str(e)}")
+            pooled.active -= 1
+            pooled.uses += 1
+            await self._release(pooled)
+
+    async def _release(self, pooled):
+        if not pooled.retiring:
+            if pooled.uses >= self.max_uses:
+                print(f"Recycling browser after {pooled.uses} uses")
+                pooled.retiring = True
+            elif self.max_memory_mb and pooled.uses % BROWSER_MEMORY_CHECK_EVERY == 0:
+                memory_mb = await self._memory_mb(pooled)
+                if memory_mb > self.max_memory_mb:
+                    print(f"Recycling browser using {memory_mb:.0f} MB")
+                    pooled.retiring = True
+        if pooled.retiring and pooled.active == 0:
+            async with self._lock:
+                if pooled in self._browsers and not self._closed:
+                    self._browsers[self._browsers.index(pooled)] = await self._launch()
+            await self._close_browser(pooled)
+
+    async def _memory_mb(self, pooled):
+        # Sum the resident memory of the browser process and all of its renderers
+        try:
+            session = await pooled.browser.new_browser_cdp_session()
+            try:
+                info = await session.send('SystemInfo.getProcessInfo')
+            finally:
+                await session.detach()
+        except Exception as e:
+            print(f"Failed to read browser memory: {str(e)}")
+            return 0
+        total_kb = 0
+        for process in info.get('processInfo', []):
+            try:
+                with open(f"/proc/{process['id']}/status") as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total_kb += int(line.split()[1])
+                            break
+            except (OSError, KeyError, ValueError):
+                continue
+        return total_kb / 1024
+
+    async def memory_mb(self):
+        # Resident memory of every browser in the pool
+        return sum([await self._memory_mb(pooled) for pooled in list(self._browsers)])
+
+    async def _close_browser(self, pooled):
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            print(f"Failed to close browser: {str(e)}")
+
+    async def close(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._closed = True
+            browsers, self._browsers = self._browsers, []
+            await asyncio.gather(*[self._close_browser(pooled) for pooled in browsers])
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+
+# Playwright objects are bound to the event loop that created them, so the pool
+# lives on one long-running loop in a background thread and callers submit to it.
+_loop = None
+_pool = None
+_state_lock = threading.Lock()
+
+
+def get_loop():
+    global _loop
+    with _state_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='browser-pool-loop', daemon=True).start()
+        return _loop
+
+
+def get_pool():
+    global _pool
+    with _state_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+
+def submit(coro):
+    # Schedule on the shared loop without waiting; returns a concurrent.futures.Future
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro, timeout=None):
+    return submit(coro).result(timeout)
+
+
+def shutdown():
+    global _pool, _loop
+    with _state_lock:
+        pool, loop = _pool, _loop
+        _pool = None
+        _loop = None
+    if loop is None:
+        return
+    if pool is not None:
+        try:
+            asyncio.run_coroutine_threadsafe(pool.close(), loop).result(10)
+        except Exception as e:
+            print(f"Error shutting down browser pool: {str(e)}")
+    loop.call_soon_threadsafe(loop.stop)
+
+
+atexit.register(shutdown)
@@ -0,0 +1,184 @@
+import asyncio
+import contextvars
+import os
+import random
+import time
+from collections import deque
+from metrics import metrics
+
+# Page loads allowed per second to each host, and how many may go out back to back
+GOVERNOR_RATE_PER_SECOND = float(os.getenv('GOVERNOR_RATE_PER_SECOND', '2'))
+GOVERNOR_BURST = int(os.getenv('GOVERNOR_BURST', '6'))
+# Month pages scraped at once per host; the limit moves between these with the host's health
+GOVERNOR_MIN_CONCURRENCY = int(os.getenv('GOVERNOR_MIN_CONCURRENCY', '1'))
+GOVERNOR_MAX_CONCURRENCY = int(os.getenv('GOVERNOR_MAX_CONCURRENCY', '8'))
+# Page loads (navigation, not the whole month's extraction) slower than this count against the host like errors do
+GOVERNOR_TARGET_LATENCY_SECONDS = float(os.getenv('GOVERNOR_TARGET_LATENCY_SECONDS', '10'))
+# Tries per month page; before retry n wait a random 0..RETRY_BASE_SECONDS * 2^(n-1), capped at RETRY_MAX_SECONDS
+SCRAPE_ATTEMPTS = int(os.getenv('SCRAPE_ATTEMPTS', '3'))
+RETRY_BASE_SECONDS = float(os.getenv('RETRY_BASE_SECONDS', '1'))
+RETRY_MAX_SECONDS = float(os.getenv('RETRY_MAX_SECONDS', '30'))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    async def take(self):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# Latency of the page load behind the current governed call, reported by whoever loads the page
+_latency = contextvars.ContextVar('governed_latency', default=None)
+
+
+def record_latency(seconds):
+    latency = _latency.get()
+    if latency is not None:
+        latency.append(seconds)
+
+
+class HostGovernor:
+    # Token-bucket rate limit plus an AIMD concurrency limit for one host: the limit grows by
+    # about one per limit's worth of fast successes and halves on an error or a slow page
+    def __init__(self, host, rate=GOVERNOR_RATE_PER_SECOND, burst=GOVERNOR_BURST,
+                 min_concurrency=GOVERNOR_MIN_CONCURRENCY, max_concurrency=GOVERNOR_MAX_CONCURRENCY,
+                 target_latency=GOVERNOR_TARGET_LATENCY_SECONDS):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.target_latency = target_latency
+        self.limit = float(self.max_concurrency)
+        self.active = 0
+        self.decreased_at = 0.0
+        self.successes = 0
+        self.failures = 0
+        self._waiters = deque()
+
+    async def _acquire(self):
+        # Only touched from the browser pool loop, so plain counters are enough
+        while self.active >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    # Woken but cancelled before taking the slot; pass it on
+                    self._wake()
+                raise
+        self.active += 1
+        return time.monotonic()
+
+    def _wake(self):
+        for _ in range(int(self.limit) - self.active):
+            if not self._waiters:
+                break
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _release(self, started, healthy):
+        # healthy is None when the outcome says nothing about the host: a cancelled page,
+        # an error in the request itself, or no page load measured
+        self.active -= 1
+        if healthy:
+            self.successes += 1
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        elif healthy is not None:
+            self.failures += 1
+            # Pages already in flight when the limit last dropped were sent at the old
+            # limit; their failures say nothing new, so only back off once per round
+            if started > self.decreased_at:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self.decreased_at = time.monotonic()
+                metrics.inc('governor_backoffs_total', host=self.host)
+                print(f"Backing off {self.host}: concurrency limit now {int(self.limit)}")
+        self._wake()
+
+    async def run(self, func):
+        started = await self._acquire()
+        healthy = None
+        latencies = []
+        token = _latency.set(latencies)
+        try:
+            await self.bucket.take()
+            result = await func()
+            # Judge the host by how fast it served the page, not by how long the scrape took
+            # in the browser afterwards (a month clicked through day by day runs long on its own)
+            if latencies:
+                healthy = max(latencies) <= self.target_latency
+            return result
+        except Exception as e:
+            # Errors about the request itself (a missing event) count neither for nor against the host
+            if getattr(e, 'retryable', True):
+                healthy = False
+            raise
+        finally:
+            _latency.reset(token)
+            self._release(started, healthy)
+
+    def stats(self):
+        return {
+            'limit': int(self.limit),
+            'active': self.active,
+            'tokens': round(self.bucket.tokens, 2),
+            'successes': self.successes,
+            'failures': self.failures,
+        }
+
+
+class Governor:
+    # Every page load of every scrape on the browser loop goes through here, one HostGovernor per host
+    def __init__(self):
+        self._hosts = {}
+
+    def host(self, host):
+        governor = self._hosts.get(host)
+        if governor is None:
+            governor = self._hosts[host] = HostGovernor(host)
+        return governor
+
+    async def call(self, host, func, description):
+        # Run func() under the host's limits, retrying what may succeed on another try
+        # with jittered exponential backoff
+        attempts = max(1, SCRAPE_ATTEMPTS)
+        for attempt in range(1, attempts + 1):
+            try:
+                return await self.host(host).run(func)
+            except Exception as e:
+                if not getattr(e, 'retryable', True) or attempt == attempts:
+                    raise
+                delay = random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempt - 1)))
+                print(f"Attempt {attempt} of {attempts} for {description} failed ({str(e)}), "
+                      f"retrying in {delay:.1f}s")
+                metrics.inc('scrape_retries_total', host=host)
+                await asyncio.sleep(delay)
+
+    def stats(self):
+        return {host: governor.stats() for host, governor in list(self._hosts.items())}
+
+    def gauges(self):
+        hosts = list(self._hosts.values())
+        return {
+            'governor_concurrency_limit': sum(int(h.limit) for h in hosts),
+            'governor_pages_in_flight': sum(h.active for h in hosts),
+        }
+
+
+governor = Governor()
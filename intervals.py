@@ -0,0 +1,211 @@
+import os
+import time
+from array import array
+from datetime import datetime
+from metrics import span
+
+# Slot length to assume when a calendar's duration couldn't be scraped
+DEFAULT_SLOT_MINUTES = int(os.getenv('DEFAULT_SLOT_MINUTES', '30'))
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def parse_utc(value):
+    # '2024-01-02T17:00:00Z' -> epoch seconds
+    return int((datetime.fromisoformat(value.rstrip('Z')) - EPOCH).total_seconds())
+
+
+def format_utc(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+def slot_array(starts):
+    # Slot starts as a sorted array of UTC epoch seconds, 8 bytes apiece
+    return array('q', sorted(starts))
+
+
+def format_availability(data):
+    # Epoch seconds -> '...Z' strings, for responses only; everything before this works on ints
+    formatted = dict(data)
+    for name in ('available_times', 'common_times'):
+        if name in formatted:
+            formatted[name] = [format_utc(t) for t in formatted[name]]
+    if 'common_windows' in formatted:
+        formatted['common_windows'] = [
+            dict(window, start=format_utc(window['start']), end=format_utc(window['end']))
+            for window in formatted['common_windows']
+        ]
+    if 'calendars' in formatted:
+        formatted['calendars'] = [format_availability(entry) for entry in formatted['calendars']]
+    return formatted
+
+
+def positive_int(data, name):
+    # Query options (quorum, min_minutes, limit...) as sent by clients; None when absent
+    value = data.get(name)
+    if value in (None, ''):
+        return None
+    value = int(value)
+    if value < 1:
+        raise ValueError(f"{name} must be a positive integer")
+    return value
+
+
+def duration_seconds(duration):
+    if isinstance(duration, dict) and duration.get('value'):
+        return int(duration['value']) * 60
+    return DEFAULT_SLOT_MINUTES * 60
+
+
+def to_intervals(starts, length):
+    # Sorted slot starts -> merged [start, end) intervals; back-to-back slots become one interval
+    intervals = []
+    for start in starts:
+        end = start + length
+        if intervals and start <= intervals[-1][1]:
+            if end > intervals[-1][1]:
+                intervals[-1][1] = end
+        else:
+            intervals.append([start, end])
+    return [(start, end) for start, end in intervals]
+
+
+def intersect(a, b):
+    # Two-pointer intersection of two sorted, disjoint interval lists
+    result = []
+    if not a or not b:
+        return result
+    append = result.append
+    len_a, len_b = len(a), len(b)
+    i = j = 0
+    a_start, a_end = a[0]
+    b_start, b_end = b[0]
+    while True:
+        start = a_start if a_start > b_start else b_start
+        if a_end < b_end:
+            if start < a_end:
+                append((start, a_end))
+            i += 1
+            if i == len_a:
+                break
+            a_start, a_end = a[i]
+        else:
+            if start < b_end:
+                append((start, b_end))
+            j += 1
+            if j == len_b:
+                break
+            b_start, b_end = b[j]
+    return result
+
+
+def intersect_all(calendars):
+    if not calendars:
+        return []
+    # Start from the sparsest calendar so the running result shrinks fastest
+    calendars = sorted(calendars, key=len)
+    result = calendars[0]
+    for intervals in calendars[1:]:
+        if not result:
+            break
+        result = intersect(result, intervals)
+    return result
+
+
+def quorum_windows(calendars, quorum):
+    # Sweep-line over every calendar's interval boundaries; returns (start, end, most_free)
+    # for maximal stretches where at least `quorum` calendars are free
+    if quorum <= 0 or quorum > len(calendars):
+        return []
+    # Boundaries packed into single ints (time << 1 | is_start) so one C-level sort
+    # orders them, with ends before starts at the same instant so touching
+    # intervals don't count as overlapping
+    events = [start << 1 | 1 for intervals in calendars for start, _ in intervals]
+    events += [end << 1 for intervals in calendars for _, end in intervals]
+    events.sort()
+    windows = []
+    count = 0
+    opened = None
+    high = 0
+    for event in events:
+        if event & 1:
+            count += 1
+            if count == quorum:
+                opened = event >> 1
+                high = count
+            elif count > high:
+                high = count
+        else:
+            count -= 1
+            if count == quorum - 1:
+                t = event >> 1
+                if t > opened:
+                    if windows and windows[-1][1] == opened:
+                        windows[-1] = (windows[-1][0], t, max(windows[-1][2], high))
+                    else:
+                        windows.append((opened, t, high))
+    return windows
+
+
+def with_min_length(windows, length):
+    return [window for window in windows if window[1] - window[0] >= length]
+
+
+def meeting_starts(windows, candidates, length, limit=None):
+    # Candidate start times whose [start, start + length) fits inside a window, earliest first
+    starts = []
+    i = 0
+    for start in candidates:
+        while i < len(windows) and windows[i][1] < start + length:
+            i += 1
+        if i == len(windows):
+            break
+        if windows[i][0] <= start:
+            starts.append(start)
+            if limit is not None and len(starts) >= limit:
+                break
+    return starts
+
+
+def common_availability(availabilities, quorum=None, min_minutes=None, limit=None):
+    # Common meeting start times and free windows across calendars, using each
+    # calendar's own slot duration. quorum=K asks for K of N calendars free
+    # (all by default); min_minutes sets the meeting length; limit keeps the earliest N.
+    with span('intersection'):
+        return _common_availability(availabilities, quorum, min_minutes, limit)
+
+
+def _common_availability(availabilities, quorum, min_minutes, limit):
+    calendars = []
+    candidates = set()
+    meeting_length = 0
+    for avail in availabilities:
+        if avail.get("error"):
+            continue
+        starts = avail.get("available_times", ())
+        length = duration_seconds(avail.get("duration"))
+        calendars.append(to_intervals(starts, length))
+        candidates.update(starts)
+        meeting_length = max(meeting_length, length)
+
+    if not calendars:
+        return {"common_times": [], "common_windows": []}
+
+    if min_minutes:
+        meeting_length = int(min_minutes) * 60
+    if quorum is None or quorum >= len(calendars):
+        windows = [(start, end, len(calendars)) for start, end in intersect_all(calendars)]
+    else:
+        windows = quorum_windows(calendars, quorum)
+    windows = with_min_length(windows, meeting_length)
+
+    starts = meeting_starts(windows, sorted(candidates), meeting_length, limit)
+    if limit is not None:
+        windows = windows[:limit]
+    return {
+        "common_times": starts,
+        "common_windows": [
+            {"start": start, "end": end, "available": free}
+            for start, end, free in windows
+        ],
+    }
@@ -0,0 +1,183 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from store import get_store
+
+JOB_TTL_SECONDS = float(os.getenv('JOB_TTL_SECONDS', '900'))
+SSE_KEEPALIVE_SECONDS = float(os.getenv('SSE_KEEPALIVE_SECONDS', '15'))
+# How often a stream reading a job from the store checks for new events
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '0.5'))
+
+
+class EventStream:
+    # Server-Sent Events over events_since(index, timeout) -> (events, finished);
+    # ids let a reconnecting EventSource resume where it left off
+    def stream(self, last_event_id=None):
+        index = last_event_id + 1 if last_event_id is not None else 0
+        while True:
+            events, finished = self.events_since(index, SSE_KEEPALIVE_SECONDS)
+            for event_id, (event, data) in events:
+                yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+            if events:
+                index = events[-1][0] + 1
+            # finished was read together with the events, so nothing can follow them
+            if finished:
+                return
+            if not events:
+                yield ': keep-alive\n\n'
+
+
+class Job(EventStream):
+    # An append-only event log that background scraping writes and HTTP streams read
+    def __init__(self, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.created_at = time.time()
+        self.status = 'running'
+        self.result = None
+        self._events = []
+        self._condition = threading.Condition()
+
+    def emit(self, event, data):
+        with self._condition:
+            self._events.append((event, data))
+            self._condition.notify_all()
+
+    def finish(self, result=None, error=None):
+        with self._condition:
+            self.status = 'failed' if error else 'done'
+            self.result = result
+            if error:
+                self._events.append(('error', {'error': error}))
+            else:
+                self._events.append(('done', result))
+            self._condition.notify_all()
+
+    @property
+    def finished(self):
+        return self.status != 'running'
+
+    def events_since(self, index, timeout=None):
+        # Block until there are events past index or the job finishes
+        with self._condition:
+            if index >= len(self._events) and not self.finished:
+                self._condition.wait(timeout)
+            return list(enumerate(self._events[index:], start=index)), self.finished
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'events': len(self._events),
+                'result': self.result,
+            }
+
+
+class JobRegistry:
+    # Jobs in this process's memory: used by the scraper service, and by a single web worker
+    def __init__(self, ttl_seconds=JOB_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self):
+        job = Job()
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.created_at < cutoff]:
+            del self._jobs[job_id]
+
+
+class StoredJob(EventStream):
+    # A job kept in the SQLite store, so any worker process can stream it. Events are
+    # written by a thread of its own because they are emitted on the browser loop.
+    def __init__(self, store, job_id):
+        self.store = store
+        self.id = job_id
+        self._writes = None
+
+    def start_writing(self):
+        self._writes = queue.Queue()
+        threading.Thread(target=self._write, daemon=True).start()
+
+    def _write(self):
+        index = 0
+        while True:
+            kind, payload = self._writes.get()
+            try:
+                if kind == 'event':
+                    self.store.add_job_event(self.id, index, *payload)
+                    index += 1
+                else:
+                    self.store.finish_job(self.id, index, *payload)
+                    return
+            except Exception as e:
+                print(f"Failed to write job {self.id} to the store: {str(e)}")
+
+    def emit(self, event, data):
+        self._writes.put(('event', (event, json.dumps(data))))
+
+    def finish(self, result=None, error=None):
+        if error:
+            self._writes.put(('finish', ('failed', None, 'error', json.dumps({'error': error}))))
+        else:
+            self._writes.put(('finish', ('done', json.dumps(result), 'done', json.dumps(result))))
+
+    def events_since(self, index, timeout=None):
+        deadline = time.time() + (timeout or 0)
+        while True:
+            status, events = self.store.job_events(self.id, index)
+            finished = status != 'running'
+            if events or finished or time.time() >= deadline:
+                return [(seq, (event, json.loads(data))) for seq, event, data in events], finished
+            time.sleep(JOB_POLL_SECONDS)
+
+    def snapshot(self):
+        job = self.store.get_job(self.id)
+        return {
+            'job_id': self.id,
+            'status': job['status'],
+            'events': job['events'],
+            'result': json.loads(job['result']) if job['result'] else None,
+        }
+
+
+class StoredJobRegistry:
+    def __init__(self, store, ttl_seconds=JOB_TTL_SECONDS):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+
+    def create(self):
+        job = StoredJob(self.store, uuid.uuid4().hex)
+        self.store.create_job(job.id, time.time(), self.ttl_seconds)
+        job.start_writing()
+        return job
+
+    def get(self, job_id):
+        if self.store.get_job(job_id) is None:
+            return None
+        return StoredJob(self.store, job_id)
+
+
+jobs = JobRegistry()
+
+
+def get_jobs():
+    # With a store every web worker sees every job; without one a job only lives in the
+    # memory of the worker that created it
+    store = get_store()
+    if store is None:
+        return jobs
+    return StoredJobRegistry(store)
@@ -0,0 +1,173 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Print every request's phase timings and include them in the response
+TRACE_REQUESTS = os.getenv('TRACE_REQUESTS', '0') == '1'
+
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_string(labels):
+    if not labels:
+        return ''
+    escaped = [
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    ]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Metrics:
+    # Counters and histograms rendered in the Prometheus text format
+    def __init__(self, buckets=PHASE_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    def snapshot(self):
+        # Plain copies keyed by (name, labels), for diffing before and after a run
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {key: {'sum': h['sum'], 'count': h['count']} for key, h in self._histograms.items()},
+            }
+
+    def render(self, gauges=None):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+
+        seen = set()
+
+        def header(name, kind):
+            if name in seen:
+                return
+            seen.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f"{name}{_label_string(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            header(name, 'histogram')
+            for bound, count in zip(self.buckets, histogram['buckets']):
+                lines.append(f"{name}_bucket{_label_string(labels + (('le', f'{bound:g}'),))} {count}")
+            lines.append(f"{name}_bucket{_label_string(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{_label_string(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{name}_count{_label_string(labels)} {histogram['count']}")
+        for name, value in sorted((gauges or {}).items()):
+            header(name, 'gauge')
+            lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+metrics.describe('scrape_phase_seconds', 'Time spent in each scraping phase')
+metrics.describe('calendly_pages_loaded_total', 'Calendly month pages loaded')
+metrics.describe('calendly_days_clicked_total', 'Days clicked to read their time slots')
+metrics.describe('availability_cache_hits_total', 'Months served from the cache or the store')
+metrics.describe('availability_cache_misses_total', 'Months that had to be scraped')
+metrics.describe('scrape_failures_total', 'Links that came back with an error')
+metrics.describe('watch_refreshes_total', 'Background refreshes of watched links')
+metrics.describe('requests_blocked_total', 'Browser requests aborted by the resource policy')
+metrics.describe('requests_allowed_total', 'Browser requests let through by the resource policy')
+metrics.describe('scrape_retries_total', 'Month pages tried again after a failure')
+metrics.describe('governor_backoffs_total', 'Times a host\'s concurrency limit was halved')
+
+
+class Trace:
+    # The spans recorded while serving one request
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def add(self, phase, seconds, event_path=None):
+        offset = time.perf_counter() - self.started - seconds
+        with self._lock:
+            self.spans.append({
+                'phase': phase,
+                'event_path': event_path,
+                'offset_seconds': round(max(offset, 0), 4),
+                'seconds': round(seconds, 4),
+            })
+
+    def merge(self, summary):
+        # Fold in spans recorded elsewhere (the scraper service), lined up to end now
+        base = time.perf_counter() - self.started - summary['total_seconds']
+        with self._lock:
+            for s in summary['spans']:
+                self.spans.append(dict(s, offset_seconds=round(max(base + s['offset_seconds'], 0), 4)))
+
+    def summary(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s['offset_seconds'])
+        return {'total_seconds': round(time.perf_counter() - self.started, 4), 'spans': spans}
+
+    def print(self, title):
+        summary = self.summary()
+        print(f"Trace for {title}: {summary['total_seconds']:.3f}s")
+        for s in summary['spans']:
+            print(f"  +{s['offset_seconds']:8.3f}s {s['seconds']:8.3f}s {s['phase']:<22} {s['event_path'] or ''}")
+
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def tracing(trace):
+    # Collect spans into trace while the block runs. run_sync/submit copy the caller's
+    # context onto the browser loop, so scraping started here reports into it too.
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record_span(phase, seconds, event_path=None):
+    metrics.observe('scrape_phase_seconds', seconds, phase=phase, event_path=event_path or '')
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(phase, seconds, event_path)
+
+
+@contextmanager
+def span(phase, event_path=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(phase, time.perf_counter() - started, event_path)
@@ -0,0 +1,206 @@
+from metrics import metrics, record_span
+from readiness import DAY_GRID_TIMEOUT_MS, POPUP_DISMISS_TIMEOUT_MS, TIME_SLOTS_TIMEOUT_MS, wait_stats
+
+# Popup containers that mean a consent/privacy banner is showing
+POPUP_SELECTORS = [
+    '#onetrust-banner-sdk',
+    '#onetrust-consent-sdk',
+    'div[role="dialog"]',
+    '[aria-label*="cookie"]',
+    '[aria-label*="privacy"]',
+    '.privacy-notice',
+    '.cookie-banner',
+    '[class*="cookie"]',
+    '[class*="privacy"]'
+]
+
+# Prioritized list of ways to find the accept button: CSS selectors or button text
+ACCEPT_BUTTONS = [
+    {'selector': '#onetrust-accept-btn-handler'},
+    {'selector': '[aria-label="Accept"]'},
+    {'text': 'accept'},
+    {'text': 'i understand'},
+    {'text': 'allow'},
+    {'text': 'got it'},
+    {'text': 'agree'},
+    {'selector': '[aria-label*="accept"]'},
+    {'selector': '[aria-label*="cookie"]'}
+]
+
+# Everything a month needs in a single round trip: wait for the day grid, dismiss the
+# consent banner, read the duration and the available days, then click each wanted day
+# and collect its time slots. Waits use a MutationObserver rather than polling.
+EXTRACT_MONTH_JS = """
+    async ({ wantedDays, needDuration, popupSelectors, acceptButtons, timeouts }) => {
+        const now = () => performance.now();
+        const timings = { timeSlots: [], days: [] };
+        const timePattern = /^\\d{1,2}:\\d{2}(am|pm)$/i;
+
+        // Resolve with check()'s result once it is truthy, re-checking on DOM mutations
+        const waitFor = (check, timeoutMs) => new Promise(resolve => {
+            const initial = check();
+            if (initial) return resolve(initial);
+            let timer = null;
+            const observer = new MutationObserver(() => {
+                const result = check();
+                if (result) {
+                    observer.disconnect();
+                    clearTimeout(timer);
+                    resolve(result);
+                }
+            });
+            timer = setTimeout(() => {
+                observer.disconnect();
+                resolve(null);
+            }, timeoutMs);
+            observer.observe(document.documentElement, {
+                childList: true,
+                subtree: true,
+                attributes: true,
+                attributeFilter: ['style', 'class', 'hidden', 'aria-label', 'aria-disabled', 'disabled']
+            });
+        });
+
+        const isVisible = el => {
+            if (!el) return false;
+            const style = window.getComputedStyle(el);
+            return style.display !== 'none' && style.visibility !== 'hidden';
+        };
+        const dateButtons = () => Array.from(document.querySelectorAll('button[aria-label*="Times available"]'))
+            .filter(button => /^\\d+$/.test(button.textContent.trim()));
+        const timeButtons = () => Array.from(document.querySelectorAll('button'))
+            .filter(button => timePattern.test(button.textContent.trim()));
+
+        // Any day button, available or not, means the month grid has rendered
+        let started = now();
+        const gridReady = await waitFor(() => Array.from(document.querySelectorAll('button[aria-label]'))
+            .some(b => /times available/i.test(b.getAttribute('aria-label'))), timeouts.dayGrid);
+        timings.dayGrid = { ms: now() - started, ready: !!gridReady };
+
+        // Check if we're on a valid Calendly page
+        if (!document.documentElement.outerHTML.toLowerCase().includes('calendly')) {
+            return { valid: false, timings };
+        }
+
+        // Handle the privacy consent popup
+        const popupVisible = () => popupSelectors.some(s => isVisible(document.querySelector(s)));
+        let consentClicked = false;
+        const consentStarted = now();
+        if (popupVisible()) {
+            const buttons = Array.from(document.querySelectorAll('button'));
+            let accept = null;
+            for (const matcher of acceptButtons) {
+                accept = matcher.selector
+                    ? document.querySelector(matcher.selector)
+                    : buttons.find(b => b.textContent.toLowerCase().trim().includes(matcher.text));
+                if (isVisible(accept)) break;
+                accept = null;
+            }
+            if (accept) {
+                accept.click();
+                consentClicked = true;
+                started = now();
+                const dismissed = await waitFor(() => !popupVisible(), timeouts.popup);
+                timings.popup = { ms: now() - started, ready: !!dismissed };
+            }
+        }
+        timings.consent = now() - consentStarted;
+
+        // Find the clock icon by its SVG path and read the duration next to it
+        let duration = null;
+        if (needDuration) {
+            started = now();
+            for (const svg of document.querySelectorAll('svg')) {
+                const hasClockPath = Array.from(svg.querySelectorAll('path'))
+                    .some(path => (path.getAttribute('d') || '').includes('M.5 5a4.5 4.5'));
+                if (!hasClockPath) continue;
+                const container = svg.closest('div');
+                if (!container) continue;
+                const parentDiv = container.parentElement;
+                const text = parentDiv ? parentDiv.textContent.trim() : container.textContent.trim();
+                const match = text.match(/(\\d+)\\s*(min|minute|hour)/i);
+                if (match) {
+                    duration = { value: parseInt(match[1]), unit: 'minutes' };
+                    break;
+                }
+            }
+            timings.duration = now() - started;
+        }
+
+        started = now();
+        const days = dateButtons()
+            .map(button => parseInt(button.textContent.trim()))
+            .sort((a, b) => a - b);
+        timings.dayList = now() - started;
+
+        const slots = {};
+        for (const day of days.filter(d => wantedDays.includes(d))) {
+            const target = dateButtons().find(b => b.textContent.trim() === String(day));
+            if (!target) continue;
+
+            // Tag the time buttons on screen so we can tell when the clicked date replaces them
+            const previous = timeButtons();
+            previous.forEach(b => b.setAttribute('data-scrape-stale', '1'));
+            const previousTimes = previous.map(b => b.textContent.trim()).join(',');
+
+            const clicked = now();
+            target.click();
+            started = now();
+            const rendered = await waitFor(() => {
+                const current = timeButtons();
+                if (current.length === 0) return null;
+                if (current.every(b => !b.hasAttribute('data-scrape-stale'))) return current;
+                return current.map(b => b.textContent.trim()).join(',') !== previousTimes ? current : null;
+            }, timeouts.timeSlots);
+            timings.timeSlots.push({ ms: now() - started, ready: !!rendered });
+
+            slots[day] = (rendered || timeButtons())
+                .filter(button => !(
+                    button.hasAttribute('disabled') ||
+                    button.getAttribute('aria-disabled') === 'true' ||
+                    button.closest('[aria-disabled="true"]')
+                ))
+                .map(button => button.textContent.trim());
+            timings.days.push(now() - clicked);
+        }
+
+        return { valid: true, consentClicked, duration, days, slots, timings };
+    }
+"""
+
+
+async def extract_month(page, wanted_days, need_duration, event_path=None):
+    result = await page.evaluate(EXTRACT_MONTH_JS, {
+        'wantedDays': list(wanted_days),
+        'needDuration': need_duration,
+        'popupSelectors': POPUP_SELECTORS,
+        'acceptButtons': ACCEPT_BUTTONS,
+        'timeouts': {
+            'dayGrid': DAY_GRID_TIMEOUT_MS,
+            'popup': POPUP_DISMISS_TIMEOUT_MS,
+            'timeSlots': TIME_SLOTS_TIMEOUT_MS,
+        },
+    })
+
+    # Feed the in-page wait timings into the same stats as every other wait
+    timings = result.get('timings') or {}
+    waits = [('day_grid', timings.get('dayGrid')), ('popup_dismissed', timings.get('popup'))]
+    waits += [('time_slots', timing) for timing in timings.get('timeSlots', [])]
+    for name, timing in waits:
+        if not timing:
+            continue
+        wait_stats.record(name, timing['ms'] / 1000, timing['ready'])
+        if not timing['ready']:
+            print(f"Wait for {name} timed out after {timing['ms'] / 1000:.2f}s")
+
+    # And into the per-phase timings; each day covers its click, wait and slot read
+    if timings.get('dayGrid'):
+        record_span('day_grid', timings['dayGrid']['ms'] / 1000, event_path)
+    for phase, key in (('consent', 'consent'), ('duration', 'duration'), ('day_list', 'dayList')):
+        if timings.get(key) is not None:
+            record_span(phase, timings[key] / 1000, event_path)
+    for ms in timings.get('days', []):
+        record_span('day_click', ms / 1000, event_path)
+    if timings.get('days'):
+        metrics.inc('calendly_days_clicked_total', len(timings['days']), event_path=event_path or '')
+    return result
@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+
+DAY_GRID_TIMEOUT_MS = int(os.getenv('DAY_GRID_TIMEOUT_MS', '10000'))
+TIME_SLOTS_TIMEOUT_MS = int(os.getenv('TIME_SLOTS_TIMEOUT_MS', '5000'))
+POPUP_DISMISS_TIMEOUT_MS = int(os.getenv('POPUP_DISMISS_TIMEOUT_MS', '2000'))
+
+class WaitStats:
+    # How long each kind of wait really took, so timeouts can be tuned from data
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, seconds, ready):
+        with self._lock:
+            stat = self._stats.setdefault(name, {'count': 0, 'timeouts': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            stat['count'] += 1
+            stat['total_seconds'] += seconds
+            stat['max_seconds'] = max(stat['max_seconds'], seconds)
+            if not ready:
+                stat['timeouts'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, stat in self._stats.items():
+                result[name] = dict(stat, avg_seconds=stat['total_seconds'] / stat['count'])
+            return result
+
+
+wait_stats = WaitStats()
+
+
+async def timed_wait(name, awaitable):
+    # Await a readiness signal, treating a timeout as "not ready" instead of an error
+    started = time.perf_counter()
+    ready = True
+    try:
+        result = await awaitable
+        if result is False:
+            ready = False
+    except Exception as e:
+        if 'Timeout' not in type(e).__name__:
+            raise
+        ready = False
+    elapsed = time.perf_counter() - started
+    wait_stats.record(name, elapsed, ready)
+    if not ready:
+        print(f"Wait for {name} timed out after {elapsed:.2f}s")
+    return ready
+
@@ -0,0 +1,75 @@
+import os
+from urllib.parse import urlsplit
+from metrics import metrics
+
+
+def _split(value):
+    return [item.strip().lower() for item in value.split(',') if item.strip()]
+
+
+BLOCK_RESOURCES = os.getenv('BLOCK_RESOURCES', '1') != '0'
+BLOCKED_RESOURCE_TYPES = set(_split(os.getenv('BLOCKED_RESOURCE_TYPES', 'image,media,font')))
+# Analytics, ad and consent vendors the booking page pulls in but we never need
+DEFAULT_BLOCKED_HOSTS = ','.join([
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'googleadservices.com',
+    'cookielaw.org',
+    'onetrust.com',
+    'facebook.net',
+    'facebook.com',
+    'hotjar.com',
+    'segment.com',
+    'segment.io',
+    'fullstory.com',
+    'intercom.io',
+    'intercomcdn.com',
+    'sentry.io',
+    'optimizely.com',
+    'bat.bing.com',
+    'licdn.com',
+    'clarity.ms',
+    'heapanalytics.com',
+    'amplitude.com',
+    'nr-data.net',
+    'browser-intake-datadoghq.com',
+])
+BLOCKED_HOSTS = _split(os.getenv('BLOCKED_HOSTS', DEFAULT_BLOCKED_HOSTS))
+# Hosts that are never blocked, whatever their resource type
+ALLOWED_HOSTS = _split(os.getenv('ALLOWED_HOSTS', ''))
+
+
+def _host_matches(host, domains):
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+
+def should_block(resource_type, url):
+    host = (urlsplit(url).hostname or '').lower()
+    if _host_matches(host, ALLOWED_HOSTS):
+        return False
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    return _host_matches(host, BLOCKED_HOSTS)
+
+
+async def _handle_route(route):
+    request = route.request
+    blocked = should_block(request.resource_type, request.url)
+    if blocked:
+        metrics.inc('requests_blocked_total', resource_type=request.resource_type)
+    else:
+        metrics.inc('requests_allowed_total')
+    try:
+        if blocked:
+            await route.abort()
+        else:
+            await route.continue_()
+    except Exception as e:
+        # The page may have navigated away or closed while the request was in flight
+        print(f"Failed to route {request.url}: {str(e)}")
+
+
+async def install_request_policy(context):
+    if BLOCK_RESOURCES:
+        await context.route('**/*', _handle_route)
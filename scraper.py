@@ -0,0 +1,696 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from browser_pool import get_pool
+from cache import availability_cache, month_flights
+from intervals import common_availability, slot_array
+from store import STORE_STALE_IF_ERROR_SECONDS, get_store
+from readiness import timed_wait
+from page_extract import extract_month
+from storage_state import storage_state
+from metrics import metrics, span
+from governor import governor, record_latency
+
+MAX_CONCURRENT_SCRAPES = int(os.getenv('MAX_CONCURRENT_SCRAPES', '6'))
+MAX_SCRAPES_PER_REQUEST = int(os.getenv('MAX_SCRAPES_PER_REQUEST', '4'))
+LINK_DEADLINE_SECONDS = float(os.getenv('LINK_DEADLINE_SECONDS', '240'))
+# Candidate days drilled per step of an earliest-slots search before checking whether to stop
+EARLIEST_BATCH_DAYS = int(os.getenv('EARLIEST_BATCH_DAYS', '7'))
+
+# Timezone booking pages are loaded in; the times they show are converted from it
+CALENDLY_TIMEZONE = os.getenv('CALENDLY_TIMEZONE', 'America/Los_Angeles')
+# Where booking pages are loaded from; point it at a local stand-in for offline benchmarks
+CALENDLY_BASE_URL = os.getenv('CALENDLY_BASE_URL', 'https://calendly.com').rstrip('/')
+CALENDLY_HOST = urlsplit(CALENDLY_BASE_URL).netloc
+# 'xhr' reads slots from the booking page's own API responses and falls back to
+# clicking through the DOM when none are seen; 'dom' always clicks
+CALENDLY_EXTRACTION_MODE = os.getenv('CALENDLY_EXTRACTION_MODE', 'xhr')
+XHR_PAYLOAD_TIMEOUT_MS = int(os.getenv('XHR_PAYLOAD_TIMEOUT_MS', '10000'))
+CALENDLY_RANGE_ENDPOINT = '/calendar/range'
+CALENDLY_EVENT_TYPE_ENDPOINT = '/api/booking/event_types/'
+
+def parse_calendly_url(url):
+    url = url.strip().strip('/')
+    if url.startswith(CALENDLY_BASE_URL + '/'):
+        return url[len(CALENDLY_BASE_URL) + 1:] or None
+    parts = url.split('calendly.com/')
+    if len(parts) != 2:
+        return None
+    path = parts[1]
+    
+    # Handle both direct links (d/xyz-abc) and traditional links (username/event)
+    if path.startswith('d/'):
+        return path  # Return the full path for direct links
+    else:
+        return path  # Return as is for traditional links
+
+class ScrapeError(Exception):
+    # retryable: another try may succeed (rate limited, server error) rather than the request being wrong
+    def __init__(self, message, details=None, retryable=False):
+        super().__init__(message)
+        self.details = details
+        self.retryable = retryable
+
+
+def _next_month(date):
+    if date.month == 12:
+        return date.replace(year=date.year + 1, month=1, day=1)
+    return date.replace(month=date.month + 1, day=1)
+
+
+def _months(start_date, end_date):
+    month_start = start_date.replace(day=1)
+    while month_start <= end_date:
+        yield month_start
+        month_start = _next_month(month_start)
+
+
+def _to_epoch(value):
+    # Calendly sends offsets like 2024-01-02T09:00:00-08:00; slots are kept as UTC epoch seconds
+    dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def parse_range_payload(payload):
+    # Turn a calendar/range response into {'YYYY-MM-DD': [epoch seconds, ...]}
+    days = {}
+    for day in payload.get('days') or []:
+        date_str = day.get('date')
+        if not date_str or day.get('status') not in (None, 'available'):
+            continue
+        slots = []
+        for spot in day.get('spots') or []:
+            if spot.get('status') not in (None, 'available') or not spot.get('start_time'):
+                continue
+            try:
+                slots.append(_to_epoch(spot['start_time']))
+            except (ValueError, TypeError) as e:
+                print(f"Error processing spot {spot}: {str(e)}")
+        if slots:
+            days[date_str] = slot_array(slots)
+    return days
+
+
+def parse_duration_payload(payload):
+    duration = payload.get('duration')
+    if isinstance(duration, int) and duration > 0:
+        return {'value': duration, 'unit': 'minutes'}
+    return None
+
+
+class AvailabilityCapture:
+    # Listens to Calendly's own booking API responses while the page loads
+    def __init__(self, page):
+        self.days = {}
+        self.timezone = None
+        self.duration = None
+        self._seen = asyncio.Event()
+        page.on('response', self._on_response)
+
+    def reset(self):
+        self.days = {}
+        self.timezone = None
+        self._seen.clear()
+
+    async def _on_response(self, response):
+        url = response.url
+        if CALENDLY_RANGE_ENDPOINT not in url and CALENDLY_EVENT_TYPE_ENDPOINT not in url:
+            return
+        try:
+            payload = await response.json()
+        except Exception as e:
+            print(f"Failed to read availability payload from {url}: {str(e)}")
+            return
+        if not isinstance(payload, dict):
+            return
+        if CALENDLY_RANGE_ENDPOINT in url:
+            self.days.update(parse_range_payload(payload))
+            self.timezone = payload.get('availability_timezone') or self.timezone
+            self._seen.set()
+        elif self.duration is None:
+            self.duration = parse_duration_payload(payload)
+
+    async def wait(self, timeout_ms):
+        return await timed_wait('availability_response', asyncio.wait_for(self._seen.wait(), timeout_ms / 1000))
+
+
+def _month_from_capture(capture, month_start):
+    prefix = month_start.strftime('%Y-%m-')
+    slots = {date_str: times for date_str, times in capture.days.items() if date_str.startswith(prefix)}
+    return {
+        'days': sorted(int(date_str[-2:]) for date_str in slots),
+        'slots': slots,
+        'timezone': capture.timezone,
+    }
+
+
+def _days_in_range(month, month_start, start_date, end_date):
+    return [day for day in month['days'] if start_date <= month_start.replace(day=day) <= end_date]
+
+
+def _month_covers(month, month_start, start_date, end_date, only_days=None):
+    # A cached month is only usable if every available day in the range was drilled
+    # into; only_days narrows that to the dates the caller actually needs
+    for day in _days_in_range(month, month_start, start_date, end_date):
+        date_str = month_start.replace(day=day).strftime('%Y-%m-%d')
+        if date_str not in month['slots'] and (only_days is None or date_str in only_days):
+            return False
+    return True
+
+
+def _merge_month(cached, scraped):
+    if cached is None:
+        return scraped
+    merged = dict(scraped)
+    merged['slots'] = dict(cached['slots'], **scraped['slots'])
+    merged['duration'] = scraped.get('duration') or cached.get('duration')
+    merged['fetched_at'] = min(cached['fetched_at'], scraped['fetched_at'])
+    return merged
+
+
+def _day_times_in_range(month, month_start, start_date, end_date):
+    for day in _days_in_range(month, month_start, start_date, end_date):
+        date_str = month_start.replace(day=day).strftime('%Y-%m-%d')
+        yield date_str, month['slots'].get(date_str, [])
+
+
+async def _load_month(page, event_path, month_start):
+    # Construct URL for this specific month
+    month_url = f"{CALENDLY_BASE_URL}/{event_path}?month={month_start.strftime('%Y-%m')}&timezone={CALENDLY_TIMEZONE}"
+    print(f"Loading calendar for month: {month_url}")
+
+    # Only wait for the document; callers wait for the signal they actually need
+    started = time.perf_counter()
+    with span('navigation', event_path):
+        response = await page.goto(month_url, wait_until='domcontentloaded')
+    record_latency(time.perf_counter() - started)
+    metrics.inc('calendly_pages_loaded_total', event_path=event_path)
+    if not response.ok:
+        print(f"Failed to load page: {response.status} {response.status_text}")
+        raise ScrapeError(
+            "Failed to load Calendly page", f"Status: {response.status}",
+            retryable=response.status == 429 or response.status >= 500
+        )
+
+
+def _wanted_days(month_start, start_date, end_date, skip_dates, only_days=None):
+    # Days of this month worth clicking, whether or not they turn out to be available
+    wanted = []
+    day_date = month_start
+    while day_date.month == month_start.month:
+        date_str = day_date.strftime('%Y-%m-%d')
+        if (start_date <= day_date <= end_date
+                and date_str not in skip_dates
+                and (only_days is None or date_str in only_days)):
+            wanted.append(day_date.day)
+        day_date += timedelta(days=1)
+    return wanted
+
+
+def _slot_times(day_date, time_slots, tz_name):
+    # '9:30am' on the page is wall time in the timezone the page was loaded with;
+    # the zone's real offset for that date applies, so DST days line up
+    zone = ZoneInfo(tz_name)
+    times = []
+    for time_str in time_slots:
+        try:
+            clock = datetime.strptime(time_str, '%I:%M%p')
+            local = datetime(day_date.year, day_date.month, day_date.day, clock.hour, clock.minute, tzinfo=zone)
+            times.append(int(local.timestamp()))
+        except (ValueError, TypeError) as e:
+            print(f"Error processing time slot {time_str}: {str(e)}")
+            continue
+    return slot_array(times)
+
+
+async def _save_consent(page, result):
+    if result.get('consentClicked'):
+        # Either there was no saved state or it went stale; save the accepted consent
+        # so later contexts skip the banner
+        print("Dismissed privacy popup")
+        await storage_state.save(page.context)
+
+
+async def _scrape_month_dom(page, event_path, month_start, start_date, end_date, need_duration, skip_dates, only_days=None):
+    # One round trip: the page dismisses consent, reads the month and clicks through the days itself
+    wanted = _wanted_days(month_start, start_date, end_date, skip_dates, only_days)
+    result = await extract_month(page, wanted, need_duration, event_path)
+    if not result.get('valid'):
+        print("Page doesn't appear to be a valid Calendly page")
+        raise ScrapeError("Invalid Calendly page", "Page content doesn't match expected Calendly format")
+    await _save_consent(page, result)
+
+    month = {
+        'days': sorted(result.get('days') or []),
+        'slots': {},
+        'duration': result.get('duration'),
+        'timezone': CALENDLY_TIMEZONE,
+    }
+    if not month['days']:
+        print(f"No available dates found for {month_start.strftime('%Y-%m')}")
+        return month
+    print(f"Available days in {month_start.strftime('%Y-%m')}: {month['days']}")
+
+    for day, time_slots in (result.get('slots') or {}).items():
+        day_date = month_start.replace(day=int(day))
+        month['slots'][day_date.strftime('%Y-%m-%d')] = _slot_times(day_date, time_slots, month['timezone'])
+    print(f"Collected time slots for {len(month['slots'])} days between {start_date} and {end_date}")
+    return month
+
+
+async def _scrape_month(page, capture, event_path, month_start, start_date, end_date, need_duration, skip_dates=(), only_days=None):
+    if capture is not None:
+        capture.reset()
+
+    fetched_at = time.time()
+    await _load_month(page, event_path, month_start)
+
+    # The booking page fetches its slots itself; use that payload when we saw it
+    payload_seen = False
+    if capture is not None:
+        with span('availability_response', event_path):
+            payload_seen = await capture.wait(XHR_PAYLOAD_TIMEOUT_MS)
+    if payload_seen:
+        print(f"Using availability payload for {month_start.strftime('%Y-%m')} (timezone {capture.timezone})")
+        month = _month_from_capture(capture, month_start)
+        month['duration'] = capture.duration
+        if month['duration'] is None and need_duration:
+            result = await extract_month(page, [], True, event_path)
+            await _save_consent(page, result)
+            month['duration'] = result.get('duration')
+    else:
+        if capture is not None:
+            print(f"No availability payload seen for {month_start.strftime('%Y-%m')}, falling back to the DOM")
+        month = await _scrape_month_dom(page, event_path, month_start, start_date, end_date, need_duration, skip_dates, only_days)
+
+    month['fetched_at'] = fetched_at
+    return month
+
+
+def _month_key(event_path, month_start):
+    return (event_path, month_start.strftime('%Y-%m'), CALENDLY_TIMEZONE)
+
+
+async def _run_blocking(func, *args):
+    # Keep SQLite I/O off the shared event loop
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+async def _stale_month(store, key, month_start, start_date, end_date, only_days=None):
+    # A stale row only stands in if it has the days we need drilled; an undrilled
+    # one would read as a month without availability
+    if store is None:
+        return None
+    month = await _run_blocking(store.get_month, key[0], key[2], key[1], STORE_STALE_IF_ERROR_SECONDS)
+    if month is None or not _month_covers(month, month_start, start_date, end_date, only_days):
+        return None
+    print(f"Serving stale availability for {key[0]} {key[1]} fetched at {datetime.fromtimestamp(month['fetched_at'])}")
+    return month
+
+
+async def _scrape_and_cache_month(key, month_start, start_date, end_date, store, base, only_days=None, refresh=False):
+    # Scrape one month on its own pooled page and publish it to the cache and store;
+    # refresh starts over instead of keeping the days we already have
+    event_path = key[0]
+    month = None if refresh else availability_cache.get(key) or base
+
+    async def scrape():
+        async with get_pool().page() as page:
+            capture = AvailabilityCapture(page) if CALENDLY_EXTRACTION_MODE == 'xhr' else None
+            return await _scrape_month(
+                page, capture, event_path, month_start, start_date, end_date,
+                not (month and month.get('duration')),
+                set(month['slots']) if month else set(),
+                only_days
+            )
+
+    # Rate limited per host, with retries for this month alone rather than the whole link
+    scraped = await governor.call(CALENDLY_HOST, scrape, f"{event_path} {key[1]}")
+    month = _merge_month(month, scraped)
+    availability_cache.put(key, month, stored_at=month['fetched_at'])
+    if store is not None:
+        await _run_blocking(store.put_month, event_path, CALENDLY_TIMEZONE, key[1], month)
+    return month
+
+
+async def _get_month(key, month_start, start_date, end_date, store, stored, only_days=None):
+    month = availability_cache.get(key)
+    hit = month is not None and _month_covers(month, month_start, start_date, end_date, only_days)
+    availability_cache.record(hit)
+    if hit:
+        print(f"Using cached availability for {key[0]} {key[1]}")
+        metrics.inc('availability_cache_hits_total', layer='memory')
+        return month
+
+    if stored is not None and _month_covers(stored, month_start, start_date, end_date, only_days):
+        print(f"Using stored availability for {key[0]} {key[1]}")
+        metrics.inc('availability_cache_hits_total', layer='store')
+        availability_cache.put(key, stored, stored_at=stored['fetched_at'])
+        return stored
+
+    metrics.inc('availability_cache_misses_total')
+    # Concurrent requests for the same month share one scrape. A shared scrape
+    # started for a narrower range may not cover ours, so go again for the rest,
+    # and in the end scrape on our own rather than wait on yet another shared one.
+    for attempt in range(4):
+        if attempt < 3:
+            scrape = month_flights.do(
+                key, lambda: _scrape_and_cache_month(key, month_start, start_date, end_date, store, stored, only_days)
+            )
+        else:
+            print(f"Shared scrapes of {key[0]} {key[1]} kept missing days, scraping it separately")
+            scrape = _scrape_and_cache_month(key, month_start, start_date, end_date, store, stored, only_days)
+        try:
+            month = await scrape
+        except Exception as e:
+            print(f"Error scraping {key[0]} {key[1]}: {str(e)}")
+            month = await _stale_month(store, key, month_start, start_date, end_date, only_days)
+            if month is not None:
+                return month
+            # Never let a failed month pass for one without availability
+            if isinstance(e, ScrapeError):
+                raise
+            raise ScrapeError(f"Failed to scrape {key[1]}", str(e)) from e
+        if _month_covers(month, month_start, start_date, end_date, only_days):
+            return month
+    # Days we still have no slots for would otherwise read as days without availability
+    raise ScrapeError(f"Failed to scrape every day of {key[1]}", "Available days came back without time slots")
+
+
+async def get_available_times_async(calendly_link, start_date, end_date, partial=None, on_day=None, only_days=None):
+    # only_days limits which days get drilled into for time slots (None means every
+    # available day in the range); days already known are returned either way
+    try:
+        print(f"Getting availability for {calendly_link} from {start_date} to {end_date}")
+
+        # Parse Calendly URL
+        event_path = parse_calendly_url(calendly_link)
+        if not event_path:
+            return {"error": "Invalid Calendly link"}
+
+        store = get_store()
+        stored_months = {}
+        if store is not None:
+            # One bulk query for every month of the range shared by all workers
+            stored_months = await _run_blocking(
+                store.get_range, event_path, CALENDLY_TIMEZONE,
+                start_date.strftime('%Y-%m'), end_date.strftime('%Y-%m')
+            )
+
+        available_times = slot_array(())
+        available_dates = []
+        duration = None
+        # Expose results as they are collected so a deadline can still return them
+        if partial is not None:
+            partial['available_times'] = available_times
+
+        for month_start in _months(start_date, end_date):
+            key = _month_key(event_path, month_start)
+            try:
+                month = await _get_month(
+                    key, month_start, start_date, end_date, store, stored_months.get(key[1]), only_days
+                )
+            except ScrapeError as e:
+                return {"error": str(e), "details": e.details}
+            if month is None:
+                continue
+
+            for date_str, day_times in _day_times_in_range(month, month_start, start_date, end_date):
+                available_dates.append(date_str)
+                available_times.extend(day_times)
+                if on_day is not None and day_times:
+                    on_day(date_str, day_times)
+            if duration is None and month.get('duration'):
+                duration = month['duration']
+                if partial is not None:
+                    partial['duration'] = duration
+
+        # Sort times before returning
+        available_times = slot_array(available_times)
+        print(f"\nTotal available times found: {len(available_times)}")
+        return {
+            "available_times": available_times,
+            "available_dates": available_dates,
+            "duration": duration
+        }
+
+    except Exception as e:
+        print(f"Error in main process: {str(e)}")
+        return {"error": f"Failed to get availability: {str(e)}"}
+
+def availability_from_months(months, start_date, end_date):
+    # One calendar's result built from month records already in hand, given as (month_start, month) pairs
+    available_times = slot_array(())
+    available_dates = []
+    duration = None
+    for month_start, month in months:
+        for date_str, day_times in _day_times_in_range(month, month_start, start_date, end_date):
+            available_dates.append(date_str)
+            available_times.extend(day_times)
+        if duration is None and month.get('duration'):
+            duration = month['duration']
+    return {
+        "available_times": slot_array(available_times),
+        "available_dates": available_dates,
+        "duration": duration
+    }
+
+
+async def prefetch_month_async(event_path, month_start, start_date, end_date):
+    # Make sure the cache holds this month with every available day between start_date
+    # and end_date drilled, scraping it only if it doesn't already
+    key = _month_key(event_path, month_start)
+    store = get_store()
+    stored = None
+    if store is not None:
+        stored = await _run_blocking(store.get_month, event_path, CALENDLY_TIMEZONE, key[1])
+    return await _get_month(key, month_start, start_date, end_date, store, stored)
+
+
+async def refresh_link_async(calendly_link, start_date, end_date):
+    # Re-scrape every month of the range from scratch and replace what the cache and store hold
+    event_path = parse_calendly_url(calendly_link)
+    if not event_path:
+        raise ScrapeError("Invalid Calendly link")
+    store = get_store()
+    for month_start in _months(start_date, end_date):
+        key = _month_key(event_path, month_start)
+        first = max(start_date, month_start)
+        last = min(end_date, _next_month(month_start) - timedelta(days=1))
+        await month_flights.do(
+            key, lambda: _scrape_and_cache_month(key, month_start, first, last, store, None, refresh=True)
+        )
+
+
+_global_semaphore = None
+
+
+def _get_global_semaphore():
+    # Created lazily so it binds to the shared browser pool loop
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCRAPES)
+    return _global_semaphore
+
+
+async def _scrape_link(link, start_date, end_date, request_semaphore, on_day=None, only_days=None):
+    entry = {'calendly_link': link, 'available_times': [], 'duration': None}
+    event_path = parse_calendly_url(link)
+    if not event_path:
+        entry['error'] = "Invalid Calendly link"
+        metrics.inc('scrape_failures_total', event_path='', reason='invalid_link')
+        return entry
+
+    partial = {'available_times': [], 'duration': None}
+    async with request_semaphore, _get_global_semaphore():
+        try:
+            result = await asyncio.wait_for(
+                get_available_times_async(
+                    link, start_date, end_date, partial,
+                    on_day=(lambda date_str, times: on_day(link, date_str, times)) if on_day else None,
+                    only_days=only_days
+                ),
+                LINK_DEADLINE_SECONDS
+            )
+        except asyncio.TimeoutError:
+            print(f"Timed out after {LINK_DEADLINE_SECONDS}s scraping {link}")
+            entry['available_times'] = slot_array(partial['available_times'])
+            entry['duration'] = partial['duration']
+            entry['error'] = f"Timed out after {LINK_DEADLINE_SECONDS:g}s, showing partial results"
+            entry['partial'] = True
+            metrics.inc('scrape_failures_total', event_path=event_path, reason='timeout')
+            return entry
+        except Exception as e:
+            print(f"Error scraping {link}: {str(e)}")
+            entry['error'] = f"Failed to get availability: {str(e)}"
+            metrics.inc('scrape_failures_total', event_path=event_path, reason='error')
+            return entry
+
+    if result.get('error'):
+        entry['error'] = result['error']
+        if result.get('details'):
+            entry['details'] = result['details']
+        metrics.inc('scrape_failures_total', event_path=event_path, reason='error')
+    else:
+        entry['available_times'] = result.get('available_times', [])
+        entry['available_dates'] = result.get('available_dates', [])
+        entry['duration'] = result.get('duration')
+    return entry
+
+
+async def scrape_links_async(calendly_links, start_date, end_date, on_day=None, on_calendar=None, only_days=None):
+    # Scrape every link of one request concurrently; slow or failed links come
+    # back as error entries instead of holding up the others. The optional
+    # callbacks report each day's times and each finished calendar as they land.
+    request_semaphore = asyncio.Semaphore(MAX_SCRAPES_PER_REQUEST)
+
+    async def scrape(link):
+        entry = await _scrape_link(link, start_date, end_date, request_semaphore, on_day, only_days)
+        if on_calendar is not None:
+            on_calendar(entry)
+        return entry
+
+    return await asyncio.gather(*[scrape(link) for link in calendly_links])
+
+
+async def plan_links_async(calendly_links, start_date, end_date, quorum=None, on_day=None, on_calendar=None):
+    # Two-phase scrape for multi-link requests. Phase 1 only reads each calendar's
+    # month grid (available days); phase 2 drills into time slots just for the days
+    # that enough calendars share to possibly produce a common slot.
+    if len(calendly_links) < 2:
+        return await scrape_links_async(calendly_links, start_date, end_date, on_day, on_calendar)
+
+    request_semaphore = asyncio.Semaphore(MAX_SCRAPES_PER_REQUEST)
+    indexes = await asyncio.gather(*[
+        _scrape_link(link, start_date, end_date, request_semaphore, only_days=set())
+        for link in calendly_links
+    ])
+
+    day_counts = {}
+    indexed = [entry for entry in indexes if not entry.get('error')]
+    for entry in indexed:
+        for date_str in entry['available_dates']:
+            day_counts[date_str] = day_counts.get(date_str, 0) + 1
+    needed = len(indexed) if quorum is None else min(quorum, len(indexed))
+    candidate_days = {date_str for date_str, count in day_counts.items() if count >= needed}
+    print(f"Drilling into {len(candidate_days)} of {len(day_counts)} available days "
+          f"shared by at least {needed} of {len(indexed)} calendars")
+
+    async def drill(link, index):
+        # Links that failed to index are reported as-is rather than scraped again
+        if index.get('error'):
+            entry = index
+        else:
+            entry = await _scrape_link(link, start_date, end_date, request_semaphore, on_day, candidate_days)
+        if on_calendar is not None:
+            on_calendar(entry)
+        return entry
+
+    return await asyncio.gather(*[drill(link, index) for link, index in zip(calendly_links, indexes)])
+
+
+async def find_earliest_async(calendly_links, start_date, end_date, count, quorum=None, min_minutes=None, on_day=None):
+    # Walk the range in date order across all calendars at once, month grid first and
+    # then a batch of shared days at a time, and stop as soon as `count` common slots
+    # are confirmed instead of scraping the whole range
+    entries = [
+        {'calendly_link': link, 'available_times': slot_array(()), 'available_dates': [], 'duration': None}
+        for link in calendly_links
+    ]
+    request_semaphore = asyncio.Semaphore(MAX_SCRAPES_PER_REQUEST)
+    common = {"common_times": [], "common_windows": []}
+    searched_until = None
+
+    async def scrape_active(first, last, only_days):
+        active = [entry for entry in entries if not entry.get('error')]
+        results = await asyncio.gather(*[
+            _scrape_link(entry['calendly_link'], first, last, request_semaphore, on_day, only_days)
+            for entry in active
+        ])
+        for entry, result in zip(active, results):
+            if result.get('error'):
+                entry['error'] = result['error']
+            if entry['duration'] is None:
+                entry['duration'] = result.get('duration')
+        return list(zip(active, results))
+
+    for month_start in _months(start_date, end_date):
+        month_first = max(start_date, month_start)
+        month_last = min(end_date, _next_month(month_start) - timedelta(days=1))
+
+        day_counts = {}
+        indexed = 0
+        for entry, index in await scrape_active(month_first, month_last, set()):
+            if index.get('error'):
+                continue
+            indexed += 1
+            entry['available_dates'].extend(index['available_dates'])
+            for date_str in index['available_dates']:
+                day_counts[date_str] = day_counts.get(date_str, 0) + 1
+        if not indexed:
+            break
+        needed = indexed if quorum is None else min(quorum, indexed)
+        candidates = sorted(date_str for date_str, day_count in day_counts.items() if day_count >= needed)
+
+        for i in range(0, len(candidates), EARLIEST_BATCH_DAYS):
+            batch = candidates[i:i + EARLIEST_BATCH_DAYS]
+            batch_first = datetime.strptime(batch[0], '%Y-%m-%d')
+            batch_last = datetime.strptime(batch[-1], '%Y-%m-%d')
+            for entry, result in await scrape_active(batch_first, batch_last, set(batch)):
+                entry['available_times'].extend(result['available_times'])
+            searched_until = batch[-1]
+
+            common = common_availability(entries, quorum=quorum, min_minutes=min_minutes, limit=count)
+            if len(common["common_times"]) >= count:
+                break
+
+        if len(common["common_times"]) >= count:
+            print(f"Found {count} common slots after searching through {searched_until}")
+            break
+        searched_until = month_last.strftime('%Y-%m-%d')
+
+    for entry in entries:
+        entry['available_times'] = slot_array(entry['available_times'])
+    return dict(common, calendars=entries, searched_until=searched_until)
+
+
+async def check_availability_async(calendly_links, start_date, end_date, options, on_event=None):
+    # A whole availability query: every calendar plus their common times. on_event(name, data)
+    # streams 'day' and 'calendar' events as they land, and 'common' narrowed so far.
+    options = dict(options)
+    earliest = options.pop('earliest', None)
+    on_day = on_calendar = None
+    if on_event is not None:
+        completed = []
+
+        def on_day(link, date_str, times):
+            on_event('day', {'calendly_link': link, 'date': date_str, 'available_times': times})
+
+        def on_calendar(entry):
+            completed.append(entry)
+            on_event('calendar', entry)
+            on_event('common', dict(
+                common_availability(completed, **options),
+                calendars_complete=len(completed),
+                calendars_total=len(calendly_links)
+            ))
+
+    if earliest:
+        result = await find_earliest_async(
+            calendly_links, start_date, end_date, earliest, options.get('quorum'), options.get('min_minutes'),
+            on_day=on_day
+        )
+        if on_calendar is not None:
+            for entry in result['calendars']:
+                on_calendar(entry)
+        return result
+
+    availabilities = await plan_links_async(
+        calendly_links, start_date, end_date, options.get('quorum'), on_day=on_day, on_calendar=on_calendar
+    )
+    return dict(common_availability(availabilities, **options), calendars=availabilities)
@@ -0,0 +1,364 @@
+import asyncio
+import os
+import queue
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+from browser_pool import run_sync, shutdown, submit  # noqa: E402
+from cache import availability_cache, month_flights  # noqa: E402
+from governor import governor  # noqa: E402
+from intervals import format_availability  # noqa: E402
+from jobs import EventStream, jobs  # noqa: E402
+from metrics import Trace, current_trace, metrics, tracing  # noqa: E402
+from readiness import wait_stats  # noqa: E402
+from scraper import check_availability_async  # noqa: E402
+from watcher import watcher  # noqa: E402
+
+# host:port or a Unix socket path; when set, the web app sends scraping here
+SCRAPER_SERVICE_ADDRESS = os.getenv('SCRAPER_SERVICE_ADDRESS', '')
+# Connections exchange pickles, so anyone holding this key can run code as the service: no default
+SCRAPER_SERVICE_AUTHKEY = os.getenv('SCRAPER_SERVICE_AUTHKEY', '').encode()
+# Queries scraping at once, and how many more may wait before new ones are turned away
+SCRAPER_SERVICE_MAX_ACTIVE = int(os.getenv('SCRAPER_SERVICE_MAX_ACTIVE', '8'))
+SCRAPER_SERVICE_MAX_QUEUED = int(os.getenv('SCRAPER_SERVICE_MAX_QUEUED', '32'))
+# How long a client waits for the next message before giving up
+SCRAPER_SERVICE_TIMEOUT_SECONDS = float(os.getenv('SCRAPER_SERVICE_TIMEOUT_SECONDS', '600'))
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+class ServiceError(Exception):
+    pass
+
+
+def parse_address(address):
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return address
+
+
+class Admission:
+    # Bounds queries in the service: up to max_active run, up to max_queued more wait for
+    # a slot, anything beyond that is rejected straight away so callers back off
+    def __init__(self, max_active=SCRAPER_SERVICE_MAX_ACTIVE, max_queued=SCRAPER_SERVICE_MAX_QUEUED):
+        self.max_active = max(1, max_active)
+        self.max_queued = max(0, max_queued)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = None
+        self.rejected = 0
+
+    def try_enter(self):
+        with self._lock:
+            if self._admitted >= self.max_active + self.max_queued:
+                self.rejected += 1
+                return False
+            self._admitted += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self._admitted -= 1
+
+    async def run(self, coro):
+        # Created lazily so it binds to the browser pool loop
+        if self._running is None:
+            self._running = asyncio.Semaphore(self.max_active)
+        async with self._running:
+            return await coro
+
+    def stats(self):
+        with self._lock:
+            return {
+                'admitted': self._admitted,
+                'max_active': self.max_active,
+                'max_queued': self.max_queued,
+                'rejected': self.rejected,
+            }
+
+
+admission = Admission()
+
+
+def _stats():
+    cache_stats = availability_cache.stats()
+    flight_stats = month_flights.stats()
+    admission_stats = admission.stats()
+    return {
+        'cache': dict(cache_stats, flights=flight_stats),
+        'wait': wait_stats.snapshot(),
+        'admission': admission_stats,
+        'governor': governor.stats(),
+        'metrics': metrics.render({
+            'availability_cache_entries': cache_stats['entries'],
+            'availability_cache_bytes': cache_stats['bytes'],
+            'availability_scrapes_in_flight': flight_stats['in_flight'],
+            'scraper_service_admitted': admission_stats['admitted'],
+            'scraper_service_rejected_total': admission_stats['rejected'],
+            **governor.gauges(),
+        }),
+    }
+
+
+async def _run_query(args, options, messages):
+    watcher.record_request(args[0])
+    trace = Trace() if options.get('trace') else None
+    try:
+        with tracing(trace):
+            result = await admission.run(check_availability_async(
+                *args, on_event=lambda event, data: messages.put(('event', (event, data)))
+            ))
+        messages.put(('result', {'result': result, 'trace': trace.summary() if trace else None}))
+    except Exception as e:
+        print(f"Error in scraper service query: {str(e)}")
+        messages.put(('error', {'error': str(e)}))
+
+
+async def _run_job(job, args, trace):
+    # A job's events and result are kept here, so any web worker can stream them
+    try:
+        with tracing(trace):
+            result = await admission.run(check_availability_async(
+                *args, on_event=lambda event, data: job.emit(event, format_availability(data))
+            ))
+        result = format_availability(result)
+        if trace is not None:
+            trace.print(f"job {job.id}")
+            result['trace'] = trace.summary()
+        job.finish(result)
+    except Exception as e:
+        print(f"Error in availability job {job.id}: {str(e)}")
+        job.finish(error=str(e))
+    finally:
+        admission.leave()
+
+
+def _start_job(args, trace):
+    if not admission.try_enter():
+        raise ServiceBusy("Scraper service is busy, try again shortly")
+    watcher.record_request(args[0])
+    job = jobs.create()
+    submit(_run_job(job, args, Trace() if trace else None))
+    return job.id
+
+
+def _job_events(job_id, index, timeout):
+    job = jobs.get(job_id)
+    if job is None:
+        return [], True
+    return job.events_since(index, timeout)
+
+
+def _job_snapshot(job_id):
+    job = jobs.get(job_id)
+    return job.snapshot() if job is not None else None
+
+
+def _watch(links):
+    return [link for link in links if watcher.watch(link)]
+
+
+def _unwatch(links):
+    return [link for link in links if watcher.unwatch(link)]
+
+
+WATCH_OPERATIONS = {
+    'watch': _watch,
+    'unwatch': _unwatch,
+    'watched': watcher.snapshot,
+}
+
+
+JOB_OPERATIONS = {
+    'start_job': _start_job,
+    'job_events': _job_events,
+    'job_snapshot': _job_snapshot,
+}
+
+
+def _serve_connection(conn):
+    # One request per connection; events are relayed from a queue so the browser loop
+    # never blocks on a slow client
+    try:
+        op, args, options = conn.recv()
+        if op in WATCH_OPERATIONS:
+            try:
+                conn.send(('result', {'result': WATCH_OPERATIONS[op](*args)}))
+            except ValueError as e:
+                conn.send(('error', {'error': str(e), 'invalid': True}))
+            return
+        if op == 'stats':
+            conn.send(('result', {'result': _stats()}))
+            return
+        if op in JOB_OPERATIONS:
+            try:
+                conn.send(('result', {'result': JOB_OPERATIONS[op](*args)}))
+            except ServiceBusy as e:
+                conn.send(('busy', {'error': str(e)}))
+            return
+        if op != 'availability':
+            conn.send(('error', {'error': f"Unknown operation {op}"}))
+            return
+        if not admission.try_enter():
+            conn.send(('busy', {'error': "Scraper service is busy, try again shortly"}))
+            return
+        try:
+            messages = queue.Queue()
+            future = submit(_run_query(args, options, messages))
+            while True:
+                kind, payload = messages.get()
+                try:
+                    conn.send((kind, payload))
+                except (OSError, EOFError):
+                    print("Client went away, cancelling its query")
+                    future.cancel()
+                    return
+                if kind != 'event':
+                    return
+        finally:
+            admission.leave()
+    except (OSError, EOFError) as e:
+        print(f"Scraper service connection failed: {str(e)}")
+    finally:
+        conn.close()
+
+
+def serve(address=SCRAPER_SERVICE_ADDRESS or '127.0.0.1:6010'):
+    if not SCRAPER_SERVICE_AUTHKEY:
+        raise SystemExit("SCRAPER_SERVICE_AUTHKEY must be set to a secret shared with the web workers")
+    listener = Listener(parse_address(address), authkey=SCRAPER_SERVICE_AUTHKEY)
+    print(f"Scraper service listening on {address} "
+          f"({admission.max_active} active, {admission.max_queued} queued)")
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError) as e:
+                # Failed handshakes (wrong authkey, dropped clients) shouldn't stop the service
+                print(f"Rejected scraper service connection: {str(e)}")
+                continue
+            threading.Thread(target=_serve_connection, args=(conn,), daemon=True).start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        shutdown()
+
+
+class ScraperServiceClient:
+    # Used by web workers in place of a browser pool of their own
+    def __init__(self, address, authkey=SCRAPER_SERVICE_AUTHKEY, timeout=SCRAPER_SERVICE_TIMEOUT_SECONDS):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.timeout = timeout
+
+    def _call(self, op, args, on_event=None):
+        if not self.authkey:
+            raise ServiceError("SCRAPER_SERVICE_AUTHKEY is not set")
+        trace = current_trace()
+        try:
+            conn = Client(self.address, authkey=self.authkey)
+        except (AuthenticationError, EOFError) as e:
+            raise ServiceError(f"Scraper service rejected the connection: {str(e)}")
+        with conn:
+            conn.send((op, args, {'trace': trace is not None}))
+            while True:
+                if not conn.poll(self.timeout):
+                    raise ServiceError(f"No reply from scraper service after {self.timeout:g}s")
+                try:
+                    kind, payload = conn.recv()
+                except EOFError:
+                    raise ServiceError("Scraper service closed the connection")
+                if kind == 'event':
+                    if on_event is not None:
+                        on_event(*payload)
+                    continue
+                if kind == 'busy':
+                    raise ServiceBusy(payload['error'])
+                if kind == 'error':
+                    if payload.get('invalid'):
+                        raise ValueError(payload['error'])
+                    raise ServiceError(payload['error'])
+                if trace is not None and payload.get('trace'):
+                    trace.merge(payload['trace'])
+                return payload['result']
+
+    def check_availability(self, calendly_links, start_date, end_date, options, on_event=None):
+        return self._call('availability', (calendly_links, start_date, end_date, options), on_event)
+
+    def stats(self):
+        return self._call('stats', ())
+
+    def watch(self, links):
+        return self._call('watch', (links,))
+
+    def unwatch(self, links):
+        return self._call('unwatch', (links,))
+
+    def watched(self):
+        return self._call('watched', ())
+
+    def start_job(self, calendly_links, start_date, end_date, options, trace=False):
+        return self._call('start_job', ((calendly_links, start_date, end_date, options), trace))
+
+    def job(self, job_id):
+        # None when the service doesn't know the job (expired, or the service restarted)
+        if self._call('job_snapshot', (job_id,)) is None:
+            return None
+        return RemoteJob(self, job_id)
+
+
+class RemoteJob(EventStream):
+    # A job running in the scraper service, read from whichever web worker the client reached
+    def __init__(self, service, job_id):
+        self.service = service
+        self.id = job_id
+
+    def events_since(self, index, timeout=None):
+        return self.service._call('job_events', (self.id, index, timeout))
+
+    def snapshot(self):
+        return self.service._call('job_snapshot', (self.id,))
+
+
+def get_scraper_service():
+    # None when scraping should happen in this process
+    if not SCRAPER_SERVICE_ADDRESS:
+        return None
+    return ScraperServiceClient(SCRAPER_SERVICE_ADDRESS)
+
+
+def check_availability(calendly_links, start_date, end_date, options, on_event=None):
+    # Run a query in the scraper service when one is configured, otherwise on the local pool
+    service = get_scraper_service()
+    if service is not None:
+        return service.check_availability(calendly_links, start_date, end_date, options, on_event)
+    watcher.record_request(calendly_links)
+    return run_sync(check_availability_async(calendly_links, start_date, end_date, options, on_event))
+
+
+def watch_links(links):
+    service = get_scraper_service()
+    return service.watch(links) if service is not None else _watch(links)
+
+
+def unwatch_links(links):
+    service = get_scraper_service()
+    return service.unwatch(links) if service is not None else _unwatch(links)
+
+
+def watched_links():
+    service = get_scraper_service()
+    return service.watched() if service is not None else watcher.snapshot()
+
+
+if __name__ == '__main__':
+    serve()
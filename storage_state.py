@@ -0,0 +1,63 @@
+import json
+import os
+import threading
+import time
+
+# Cookies/localStorage saved after the consent banner is accepted, shared by every
+# worker process (leave empty to start every context from scratch)
+STORAGE_STATE_PATH = os.getenv('STORAGE_STATE_PATH', 'browser_state.json')
+# Saved state older than this is ignored so consent is re-accepted and re-saved
+STORAGE_STATE_MAX_AGE_SECONDS = float(os.getenv('STORAGE_STATE_MAX_AGE_SECONDS', '86400'))
+
+
+class StorageState:
+    def __init__(self, path=STORAGE_STATE_PATH, max_age=STORAGE_STATE_MAX_AGE_SECONDS):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._state = None
+        self._mtime = None
+
+    def load(self):
+        # The saved state as a dict for new_context(storage_state=...), or None.
+        # Re-read only when the file changes, which is how other processes' saves show up.
+        if not self.path:
+            return None
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return None
+        if time.time() - mtime > self.max_age:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    with open(self.path) as f:
+                        self._state = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Failed to read browser storage state: {str(e)}")
+                    self._state = None
+                self._mtime = mtime
+            return self._state
+
+    async def save(self, context):
+        if not self.path:
+            return
+        try:
+            state = await context.storage_state()
+        except Exception as e:
+            print(f"Failed to read storage state from context: {str(e)}")
+            return
+        # Write to a temp file and rename so readers never see a half-written file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Failed to save browser storage state: {str(e)}")
+            return
+        print(f"Saved browser storage state to {self.path}")
+
+
+storage_state = StorageState()
@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from intervals import parse_utc, slot_array
+
+AVAILABILITY_DB_PATH = os.getenv('AVAILABILITY_DB_PATH', '')
+# Rows younger than this are served instead of scraping
+STORE_MAX_AGE_SECONDS = float(os.getenv('STORE_MAX_AGE_SECONDS', '900'))
+# When a scrape fails, older rows up to this age are still better than nothing
+STORE_STALE_IF_ERROR_SECONDS = float(os.getenv('STORE_STALE_IF_ERROR_SECONDS', '86400'))
+# Rows older than this are deleted when the store is opened
+STORE_RETENTION_SECONDS = float(os.getenv('STORE_RETENTION_SECONDS', str(7 * 86400)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS months (
+    event_path TEXT NOT NULL,
+    timezone TEXT NOT NULL,
+    month TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    days TEXT NOT NULL,
+    duration TEXT,
+    PRIMARY KEY (event_path, timezone, month)
+);
+CREATE TABLE IF NOT EXISTS day_slots (
+    event_path TEXT NOT NULL,
+    timezone TEXT NOT NULL,
+    date TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    slots TEXT NOT NULL,
+    PRIMARY KEY (event_path, timezone, date)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+def _load_slots(slots):
+    # Rows written before slots were kept as epoch seconds hold '...Z' strings
+    return slot_array(parse_utc(t) if isinstance(t, str) else t for t in json.loads(slots))
+
+
+class AvailabilityStore:
+    # On-disk month/day availability shared by every worker process and across restarts
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        self.prune(STORE_RETENTION_SECONDS)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # One connection per thread; WAL lets readers run alongside a writer
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+        return conn
+
+    def put_month(self, event_path, timezone, month_key, month):
+        conn = self._connect()
+        fetched_at = month.get('fetched_at') or time.time()
+        duration = json.dumps(month['duration']) if month.get('duration') else None
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT OR REPLACE INTO months (event_path, timezone, month, fetched_at, days, duration) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (event_path, timezone, month_key, fetched_at, json.dumps(month['days']), duration)
+            )
+            conn.executemany(
+                'INSERT OR REPLACE INTO day_slots (event_path, timezone, date, fetched_at, slots) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(event_path, timezone, date, fetched_at, json.dumps(list(slots))) for date, slots in month['slots'].items()]
+            )
+
+    def get_range(self, event_path, timezone, first_month, last_month, max_age=STORE_MAX_AGE_SECONDS):
+        # Bulk-load every fresh month between first_month and last_month ('YYYY-MM')
+        # in two queries; returns {month: month record}
+        conn = self._connect()
+        min_fetched = time.time() - max_age
+        months = {}
+        for month_key, fetched_at, days, duration in conn.execute(
+            'SELECT month, fetched_at, days, duration FROM months '
+            'WHERE event_path = ? AND timezone = ? AND month BETWEEN ? AND ? AND fetched_at >= ?',
+            (event_path, timezone, first_month, last_month, min_fetched)
+        ):
+            months[month_key] = {
+                'days': json.loads(days),
+                'slots': {},
+                'duration': json.loads(duration) if duration else None,
+                'timezone': timezone,
+                'fetched_at': fetched_at,
+            }
+        if not months:
+            return months
+        for date, fetched_at, slots in conn.execute(
+            'SELECT date, fetched_at, slots FROM day_slots '
+            'WHERE event_path = ? AND timezone = ? AND date BETWEEN ? AND ? AND fetched_at >= ?',
+            (event_path, timezone, first_month + '-01', last_month + '-31', min_fetched)
+        ):
+            month = months.get(date[:7])
+            if month is not None:
+                month['slots'][date] = _load_slots(slots)
+                month['fetched_at'] = min(month['fetched_at'], fetched_at)
+        return months
+
+    def get_month(self, event_path, timezone, month_key, max_age=STORE_MAX_AGE_SECONDS):
+        return self.get_range(event_path, timezone, month_key, month_key, max_age).get(month_key)
+
+    def create_job(self, job_id, created_at, ttl_seconds):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Jobs are short-lived; drop expired ones whenever a new one starts
+            expired = created_at - ttl_seconds
+            conn.execute(
+                'DELETE FROM job_events WHERE job_id IN (SELECT job_id FROM jobs WHERE created_at < ?)', (expired,)
+            )
+            conn.execute('DELETE FROM jobs WHERE created_at < ?', (expired,))
+            conn.execute(
+                "INSERT INTO jobs (job_id, created_at, status) VALUES (?, ?, 'running')", (job_id, created_at)
+            )
+
+    def add_job_event(self, job_id, seq, event, data):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT INTO job_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)', (job_id, seq, event, data)
+            )
+
+    def finish_job(self, job_id, seq, status, result, event, data):
+        # The final event and the status change land together, so readers never see one without the other
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT INTO job_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)', (job_id, seq, event, data)
+            )
+            conn.execute('UPDATE jobs SET status = ?, result = ? WHERE job_id = ?', (status, result, job_id))
+
+    def get_job(self, job_id):
+        row = self._connect().execute(
+            'SELECT status, result, (SELECT COUNT(*) FROM job_events WHERE job_id = jobs.job_id) '
+            'FROM jobs WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'result': row[1], 'events': row[2]}
+
+    def job_events(self, job_id, index):
+        # Status and events from one snapshot: a finished status means these are all the events
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            row = conn.execute('SELECT status FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            events = conn.execute(
+                'SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq >= ? ORDER BY seq',
+                (job_id, index)
+            ).fetchall()
+        return (row[0] if row else 'failed'), events
+
+    def prune(self, max_age):
+        conn = self._connect()
+        min_fetched = time.time() - max_age
+        with conn:
+            conn.execute('DELETE FROM months WHERE fetched_at < ?', (min_fetched,))
+            conn.execute('DELETE FROM day_slots WHERE fetched_at < ?', (min_fetched,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    # None when no AVAILABILITY_DB_PATH is configured
+    global _store
+    if not AVAILABILITY_DB_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = AvailabilityStore(AVAILABILITY_DB_PATH)
+        return _store
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from browser_pool import submit
+from metrics import metrics
+from scraper import parse_calendly_url, refresh_link_async
+
+# How often each watched link is re-scraped; keep it below CACHE_TTL_SECONDS so the cache stays warm
+WATCH_REFRESH_SECONDS = float(os.getenv('WATCH_REFRESH_SECONDS', '300'))
+# Each refresh is moved by up to this much either way so watched links don't all fire at once
+WATCH_JITTER_SECONDS = float(os.getenv('WATCH_JITTER_SECONDS', '30'))
+WATCH_MAX_CONCURRENT = int(os.getenv('WATCH_MAX_CONCURRENT', '2'))
+# Months refreshed, starting with the current one
+WATCH_MONTHS_AHEAD = int(os.getenv('WATCH_MONTHS_AHEAD', '2'))
+WATCH_MAX_LINKS = int(os.getenv('WATCH_MAX_LINKS', '50'))
+# Links requested this many times within the window are watched automatically (0 disables)
+WATCH_AUTO_THRESHOLD = int(os.getenv('WATCH_AUTO_THRESHOLD', '5'))
+WATCH_AUTO_WINDOW_SECONDS = float(os.getenv('WATCH_AUTO_WINDOW_SECONDS', '3600'))
+# Automatically watched links nobody has asked for in this long are dropped again
+WATCH_AUTO_IDLE_SECONDS = float(os.getenv('WATCH_AUTO_IDLE_SECONDS', '86400'))
+
+
+def refresh_range(months_ahead=WATCH_MONTHS_AHEAD):
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = today.replace(day=1)
+    for _ in range(max(1, months_ahead)):
+        end = (end + timedelta(days=32)).replace(day=1)
+    return today, end - timedelta(days=1)
+
+
+class Watcher:
+    # Keeps popular calendars warm by re-scraping them in the background on the browser loop
+    def __init__(self, refresh_seconds=WATCH_REFRESH_SECONDS, jitter_seconds=WATCH_JITTER_SECONDS,
+                 max_concurrent=WATCH_MAX_CONCURRENT, max_links=WATCH_MAX_LINKS):
+        self.refresh_seconds = refresh_seconds
+        self.jitter_seconds = jitter_seconds
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_links = max_links
+        self._lock = threading.Lock()
+        self._links = {}
+        self._requests = {}
+        self._tasks = set()
+        self._started = False
+
+    def watch(self, link, source='api'):
+        if not parse_calendly_url(link):
+            raise ValueError(f"Invalid Calendly link: {link}")
+        with self._lock:
+            entry = self._links.get(link)
+            if entry is not None:
+                # A link asked for explicitly stays watched even once it stops being popular
+                if source == 'api':
+                    entry['source'] = 'api'
+                return False
+            if len(self._links) >= self.max_links:
+                raise ValueError(f"Already watching the maximum of {self.max_links} links")
+            self._links[link] = {
+                'source': source,
+                'added_at': time.time(),
+                'next_refresh': time.time(),
+                'last_refreshed': None,
+                'last_error': None,
+                'refreshes': 0,
+                'refreshing': False,
+            }
+        print(f"Watching {link} ({source})")
+        self._ensure_started()
+        return True
+
+    def unwatch(self, link):
+        with self._lock:
+            removed = self._links.pop(link, None) is not None
+        if removed:
+            print(f"Stopped watching {link}")
+        return removed
+
+    def record_request(self, links):
+        # Count interactive requests per link and start watching the frequent ones
+        if WATCH_AUTO_THRESHOLD <= 0:
+            return
+        now = time.time()
+        popular = []
+        with self._lock:
+            for link in set(links):
+                if not parse_calendly_url(link):
+                    continue
+                recent = self._requests.setdefault(link, deque())
+                recent.append(now)
+                while recent and recent[0] < now - WATCH_AUTO_WINDOW_SECONDS:
+                    recent.popleft()
+                if len(recent) >= WATCH_AUTO_THRESHOLD and link not in self._links:
+                    popular.append(link)
+        for link in popular:
+            try:
+                self.watch(link, source='auto')
+            except ValueError as e:
+                print(f"Not auto-watching {link}: {str(e)}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'refresh_seconds': self.refresh_seconds,
+                'max_concurrent': self.max_concurrent,
+                'links': [dict(entry, calendly_link=link) for link, entry in self._links.items()],
+            }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        submit(self._run())
+
+    def _due(self, now):
+        with self._lock:
+            # Drop automatically watched links that have gone quiet
+            for link, entry in list(self._links.items()):
+                recent = self._requests.get(link)
+                last_request = recent[-1] if recent else entry['added_at']
+                if entry['source'] == 'auto' and now - last_request > WATCH_AUTO_IDLE_SECONDS:
+                    print(f"Stopped watching {link}: not requested for {WATCH_AUTO_IDLE_SECONDS:g}s")
+                    del self._links[link]
+                    self._requests.pop(link, None)
+            # Forget request counts for links that haven't been asked for in a while
+            for link, recent in list(self._requests.items()):
+                if link not in self._links and (not recent or recent[-1] < now - WATCH_AUTO_WINDOW_SECONDS):
+                    del self._requests[link]
+            due = [
+                link for link, entry in self._links.items()
+                if not entry['refreshing'] and entry['next_refresh'] <= now
+            ]
+            for link in due:
+                self._links[link]['refreshing'] = True
+            return due
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        while True:
+            for link in self._due(time.time()):
+                task = asyncio.ensure_future(self._refresh(link, semaphore))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            await asyncio.sleep(1)
+
+    async def _refresh(self, link, semaphore):
+        error = None
+        async with semaphore:
+            start_date, end_date = refresh_range()
+            started = time.time()
+            try:
+                await refresh_link_async(link, start_date, end_date)
+                print(f"Refreshed {link} in {time.time() - started:.1f}s")
+            except Exception as e:
+                error = str(e)
+                print(f"Failed to refresh {link}: {error}")
+        metrics.inc('watch_refreshes_total', result='error' if error else 'ok')
+        with self._lock:
+            entry = self._links.get(link)
+            if entry is None:
+                return
+            entry['refreshing'] = False
+            entry['last_error'] = error
+            entry['next_refresh'] = (
+                time.time() + self.refresh_seconds + random.uniform(-self.jitter_seconds, self.jitter_seconds)
+            )
+            if error is None:
+                entry['last_refreshed'] = time.time()
+                entry['refreshes'] += 1
+
+
+watcher = Watcher()